@@ -1,63 +1,171 @@
-from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
-from typing import Optional
-from jose import jwt
-from datetime import datetime, timedelta, timezone
-from .settings import settings
-from .database import get_db
-from .models import User
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-security = HTTPBearer()
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
-def create_access_token(data: dict) -> str:
-    to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + timedelta(minutes=settings.access_token_expire_minutes)
-    to_encode.update({"exp" : expire})
-    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
-    return encoded_jwt
-
-def decode_access_token(token: str) -> Optional[dict]:
-    try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        return payload
-    except jwt.JWTError as e:
-        return None
-
-async def get_current_user(
-        credentials: HTTPAuthorizationCredentials = Depends(security),
-        db: Session = Depends(get_db)
-) -> User:
-    token = credentials.credentials
-    payload = decode_access_token(token)
-
-    if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
-
-    user_id = payload.get("sub")
-    if user_id is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
-
-    user_id = int(user_id)
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found"
-        )
-
-    return user
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from passlib.context import CryptContext
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from jose import jwt
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import hashlib
+import time
+from .settings import settings
+from .database import get_db, get_read_db
+from .models import User
+from .cache import TTLCache
+from . import metrics
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+security = HTTPBearer()
+
+password_hash_seconds = metrics.Histogram(
+    "password_hash_seconds",
+    "Time to hash or verify a password, including time queued for a worker",
+    ["operation"]
+)
+password_hash_in_flight = metrics.Gauge(
+    "password_hash_in_flight",
+    "Password hash and verify calls queued or running"
+)
+auth_cache_requests = metrics.Counter(
+    "auth_cache_requests_total",
+    "Lookups in the authentication caches",
+    ["cache", "result"]
+)
+password_hash_rejected = metrics.Counter(
+    "password_hash_rejected_total",
+    "Password hash and verify calls rejected because the worker pool was saturated",
+    ["operation"]
+)
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+def get_password_hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _create_hash_executor() -> Executor:
+    if settings.password_hash_executor == "process":
+        return ProcessPoolExecutor(max_workers=settings.password_hash_workers)
+    return ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="password-hash")
+
+_hash_executor: Optional[Executor] = None
+_hash_pending = 0
+
+def shutdown_hash_executor() -> None:
+    global _hash_executor
+    executor, _hash_executor = _hash_executor, None
+    if executor is not None:
+        executor.shutdown(cancel_futures=True)
+
+async def _run_in_hash_pool(operation: str, func, *args):
+    global _hash_executor, _hash_pending
+
+    if _hash_pending >= settings.password_hash_workers + settings.password_hash_max_pending:
+        password_hash_rejected.inc(operation=operation)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication is busy, please retry shortly",
+            headers={"Retry-After" : "1"}
+        )
+
+    if _hash_executor is None:
+        _hash_executor = _create_hash_executor()
+
+    _hash_pending += 1
+    password_hash_in_flight.inc()
+    start = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_pending -= 1
+        password_hash_in_flight.dec()
+        password_hash_seconds.observe(time.perf_counter() - start, operation=operation)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_in_hash_pool("verify", verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_in_hash_pool("hash", get_password_hash, password)
+
+def create_access_token(data: dict) -> str:
+    to_encode = data.copy()
+    expire = datetime.now(timezone.utc) + timedelta(minutes=settings.access_token_expire_minutes)
+    to_encode.update({"exp" : expire})
+    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
+    return encoded_jwt
+
+_token_cache = TTLCache(maxsize=settings.token_cache_max_entries, ttl=settings.token_cache_ttl_seconds)
+_user_cache = TTLCache(maxsize=settings.user_cache_max_entries, ttl=settings.user_cache_ttl_seconds)
+
+def decode_access_token(token: str) -> Optional[dict]:
+    key = hashlib.sha256(token.encode()).digest()
+    payload = _token_cache.get(key)
+    if payload is not None:
+        auth_cache_requests.inc(cache="token", result="hit")
+        return payload
+
+    auth_cache_requests.inc(cache="token", result="miss")
+    try:
+        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    except jwt.JWTError as e:
+        return None
+
+    # Never serve a cached payload past the token's own expiry.
+    remaining = payload.get("exp", 0) - time.time()
+    if remaining > 0:
+        _token_cache.set(key, payload, ttl=min(settings.token_cache_ttl_seconds, remaining))
+    return payload
+
+def invalidate_user(user_id: int) -> None:
+    _user_cache.pop(user_id)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target):
+    invalidate_user(target.id)
+
+async def get_current_user(
+        credentials: HTTPAuthorizationCredentials = Depends(security),
+        db: AsyncSession = Depends(get_db),
+        read_db: AsyncSession = Depends(get_read_db)
+) -> User:
+    token = credentials.credentials
+    payload = decode_access_token(token)
+
+    if payload is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials"
+        )
+
+    user_id = payload.get("sub")
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials"
+        )
+
+    user_id = int(user_id)
+    # Handlers share these sessions through dependency caching; the tag drives read-your-writes routing.
+    db.info["user_id"] = read_db.info["user_id"] = user_id
+
+    user = _user_cache.get(user_id)
+    if user is not None:
+        auth_cache_requests.inc(cache="user", result="hit")
+        return user
+
+    auth_cache_requests.inc(cache="user", result="miss")
+    user = await read_db.get(User, user_id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+
+    # Ending the lookup's transaction returns its connection to the pool, so write handlers do not hold
+    # a second one for the whole request. Closing also detaches the user, which is cached across requests.
+    await read_db.close()
+    _user_cache.set(user_id, user)
+    return user
@@ -0,0 +1,177 @@
+import csv
+import io
+import json
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+import orjson
+from .schemas import read_flashcard
+
+FORMATS = ("csv", "tsv", "json", "ndjson")
+
+MEDIA_TYPES = {
+    "csv" : "text/csv",
+    "tsv" : "text/tab-separated-values",
+    "json" : "application/json",
+    "ndjson" : "application/x-ndjson",
+}
+
+EXPORT_FIELDS = ("id", "question", "answer", "difficulty", "created_at")
+
+# Largest single element a JSON import buffers before giving up on it.
+_MAX_ELEMENT_CHARS = 1 << 20
+
+class RowError(ValueError):
+    pass
+
+def _iter_csv(text: IO[str]) -> Iterator[Tuple[int, dict]]:
+    reader = csv.DictReader(text)
+    if not reader.fieldnames or not {"question", "answer"} <= set(reader.fieldnames):
+        raise RowError("CSV header must include 'question' and 'answer' columns")
+
+    for row in reader:
+        yield reader.line_num, row
+
+def _iter_tsv(text: IO[str]) -> Iterator[Tuple[int, dict]]:
+    # Anki's "Notes in Plain Text" export: front<TAB>back[<TAB>tags], with '#' header directives.
+    for line_number, line in enumerate(text, start=1):
+        line = line.rstrip("\r\n")
+        if not line or line.startswith("#"):
+            continue
+
+        fields = line.split("\t")
+        if len(fields) < 2:
+            yield line_number, RowError("Expected at least two tab-separated fields")
+            continue
+        yield line_number, {"question" : fields[0], "answer" : fields[1]}
+
+def _iter_ndjson(text: IO[str]) -> Iterator[Tuple[int, dict]]:
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, RowError(f"Invalid JSON: {e.msg}")
+
+def _may_be_cut_off(buffer: str, error: json.JSONDecodeError) -> bool:
+    # A decode error caused by the chunk boundary is an unterminated string or sits within the last
+    # few characters (a partial literal, number or \u escape); anything earlier is malformed JSON.
+    return error.msg.startswith("Unterminated string") or len(buffer) - error.pos <= 6
+
+def _iter_json_array(text: IO[str], chunk_size: int=65536) -> Iterator[Tuple[int, dict]]:
+    """Decode a top-level JSON array one element at a time instead of loading the whole document.
+
+    Parsing stops at the first malformed element or missing separator. More of the upload is read
+    only while the current element may be cut off at a chunk boundary, up to _MAX_ELEMENT_CHARS.
+    """
+    decoder = json.JSONDecoder()
+    buffer = text.read(chunk_size).lstrip()
+    if not buffer.startswith("["):
+        raise RowError("JSON import must be an array of objects")
+    buffer = buffer[1:]
+
+    index = 0
+    expect_value = True
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if not buffer:
+            buffer = "" if eof else text.read(chunk_size)
+            if not buffer:
+                raise RowError(f"Invalid JSON after element {index}")
+            continue
+
+        if not expect_value:
+            if buffer.startswith("]"):
+                return
+            if not buffer.startswith(","):
+                raise RowError(f"Expected ',' or ']' after element {index}")
+            buffer = buffer[1:]
+            expect_value = True
+            continue
+
+        if index == 0 and buffer.startswith("]"):
+            return
+
+        try:
+            item, end = decoder.raw_decode(buffer)
+            # A number can decode early when the chunk boundary splits it.
+            cut_off = end == len(buffer)
+        except json.JSONDecodeError as e:
+            if eof or len(buffer) > _MAX_ELEMENT_CHARS or not _may_be_cut_off(buffer, e):
+                raise RowError(f"Invalid JSON after element {index}")
+            cut_off = True
+
+        if cut_off and not eof:
+            more = text.read(chunk_size)
+            eof = not more
+            buffer += more
+            continue
+
+        index += 1
+        yield index, item
+        buffer = buffer[end:]
+        expect_value = False
+
+_PARSERS = {
+    "csv" : _iter_csv,
+    "tsv" : _iter_tsv,
+    "json" : _iter_json_array,
+    "ndjson" : _iter_ndjson,
+}
+
+def iter_import_rows(file: IO[bytes], format: str) -> Iterator[Tuple[int, object]]:
+    """Yield (row number, dict or RowError) pairs from an uploaded file, reading it incrementally."""
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        yield from _PARSERS[format](text)
+    finally:
+        text.detach()
+
+def take_rows(rows: Iterator[Tuple[int, object]], limit: int) -> Tuple[List[Tuple[int, object]], Optional[Exception]]:
+    """Read up to ``limit`` rows. An error that stops parsing is returned alongside the rows read before it."""
+    taken = []
+    try:
+        for item in rows:
+            taken.append(item)
+            if len(taken) >= limit:
+                break
+    except (RowError, csv.Error, UnicodeDecodeError) as e:
+        return taken, e
+    return taken, None
+
+def _export_row(flashcard) -> dict:
+    row = read_flashcard(flashcard)
+    row["created_at"] = row["created_at"].isoformat()
+    return row
+
+def _delimited(rows: Iterable[dict], delimiter: str, header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, delimiter=delimiter, lineterminator="\n", extrasaction="ignore")
+    if header:
+        writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+def _dumps(row: dict) -> str:
+    return orjson.dumps(row).decode()
+
+def _anki_field(value: str) -> str:
+    return value.replace("\t", " ").replace("\r\n", "<br>").replace("\n", "<br>")
+
+def format_chunk(flashcards: List, format: str, first: bool) -> str:
+    rows = [_export_row(flashcard) for flashcard in flashcards]
+
+    if format == "csv":
+        return _delimited(rows, ",", header=first)
+    if format == "tsv":
+        return "".join(f"{_anki_field(row['question'])}\t{_anki_field(row['answer'])}\n" for row in rows)
+    if format == "json":
+        return ("[" if first else ",") + ",".join(_dumps(row) for row in rows)
+    return "".join(_dumps(row) + "\n" for row in rows)
+
+def format_footer(format: str, wrote_any: bool) -> str:
+    if format == "json":
+        return "]" if wrote_any else "[]"
+    if format == "csv" and not wrote_any:
+        return _delimited([], ",", header=True)
+    return ""
@@ -1,15 +1,207 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from .settings import settings
-
-engine = create_engine(settings.database_url)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+import time
+from typing import List
+from sqlalchemy import Select, create_engine, event, exc, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from .cache import TTLCache
+from .settings import settings
+from . import metrics
+
+pool_size = metrics.Gauge(
+    "db_pool_size",
+    "Connections a pool keeps open, excluding overflow",
+    ["pool"]
+)
+pool_checked_out = metrics.Gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out of a pool",
+    ["pool"]
+)
+pool_overflow = metrics.Gauge(
+    "db_pool_overflow",
+    "Overflow connections currently open beyond pool_size",
+    ["pool"]
+)
+pool_checkout_seconds = metrics.Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+pool_checkout_timeouts = metrics.Counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that gave up after pool_timeout",
+    ["pool"]
+)
+reads_routed = metrics.Counter(
+    "db_reads_routed_total",
+    "Statements issued by read-only handlers, by the engine they were sent to",
+    ["target", "reason"]
+)
+
+ASYNC_DRIVERS = {
+    "postgresql" : "postgresql+asyncpg",
+    "sqlite" : "sqlite+aiosqlite",
+}
+
+def async_database_url(url: str) -> str:
+    scheme, separator, rest = url.partition("://")
+    dialect, _, driver = scheme.partition("+")
+    if driver in ("asyncpg", "aiosqlite", "psycopg_async"):
+        return url
+    return ASYNC_DRIVERS.get(dialect, scheme) + separator + rest
+
+class _InstrumentedPool:
+    """Exports checkout wait time and occupancy of the queue pool it is mixed into."""
+
+    label = "default"
+
+    def _report(self) -> None:
+        pool_checked_out.set(self.checkedout(), pool=self.label)
+        pool_overflow.set(max(0, self.overflow()), pool=self.label)
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_checkout_timeouts.inc(pool=self.label)
+            raise
+        finally:
+            pool_checkout_seconds.observe(time.perf_counter() - start, pool=self.label)
+            self._report()
+
+    def _do_return_conn(self, record) -> None:
+        super()._do_return_conn(record)
+        self._report()
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool built from the class, so carry the label over.
+        pool = super().recreate()
+        pool.label = self.label
+        return pool
+
+class InstrumentedQueuePool(_InstrumentedPool, QueuePool):
+    pass
+
+class InstrumentedAsyncQueuePool(_InstrumentedPool, AsyncAdaptedQueuePool):
+    pass
+
+def pool_options(url: str, size: int, max_overflow: int, is_async: bool) -> dict:
+    # In-memory SQLite needs its single shared connection, so leave its pool alone.
+    if url.startswith("sqlite") and (":memory:" in url or url.partition("://")[2] in ("", "/")):
+        return {}
+    return {
+        "poolclass" : InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size" : size,
+        "max_overflow" : max_overflow,
+        "pool_timeout" : settings.db_pool_timeout_seconds,
+        "pool_recycle" : settings.db_pool_recycle_seconds,
+        "pool_pre_ping" : settings.db_pool_pre_ping,
+    }
+
+def label_pool(engine, label: str, size: int) -> None:
+    if isinstance(engine.pool, _InstrumentedPool):
+        engine.pool.label = label
+        pool_size.set(size, pool=label)
+
+# The sync engine only runs startup DDL and the session count behind /metrics; requests use the async pool.
+engine = create_engine(
+    settings.database_url,
+    **pool_options(settings.database_url, settings.db_sync_pool_size, 0, is_async=False)
+)
+label_pool(engine, "sync", settings.db_sync_pool_size)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+async_engine = create_async_engine(
+    async_database_url(settings.database_url),
+    **pool_options(settings.database_url, settings.db_pool_size, settings.db_max_overflow, is_async=True)
+)
+label_pool(async_engine.sync_engine, "primary", settings.db_pool_size)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+replica_engine = None
+if settings.read_replica_url:
+    replica_engine = create_async_engine(
+        async_database_url(settings.read_replica_url),
+        **pool_options(settings.read_replica_url, settings.db_pool_size, settings.db_max_overflow, is_async=True)
+    )
+    label_pool(replica_engine.sync_engine, "replica", settings.db_pool_size)
+
+# Users who committed a write recently. This is per process: with several workers, a read served by a
+# different worker than the one that took the write can still see a lagging replica.
+_recent_writers = TTLCache(maxsize=settings.read_your_writes_max_entries, ttl=settings.read_your_writes_seconds)
+
+def mark_recent_writer(user_id: int) -> None:
+    _recent_writers.set(user_id, True)
+
+@event.listens_for(Session, "after_commit")
+def _track_writer(session):
+    # Request sessions are tagged with the authenticated user by get_current_user.
+    user_id = session.info.get("user_id")
+    if user_id is not None:
+        mark_recent_writer(user_id)
+
+class RoutingSession(Session):
+    """Sends plain SELECTs to the replica, unless the session's user wrote within the read-your-writes window."""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or not isinstance(clause, Select) or clause._for_update_arg is not None:
+            reason = "write"
+        elif self.info.get("user_id") in _recent_writers:
+            reason = "recent_write"
+        else:
+            reads_routed.inc(target="replica", reason="read")
+            return replica_engine.sync_engine
+
+        reads_routed.inc(target="primary", reason=reason)
+        return async_engine.sync_engine
+
+ReadSessionLocal = async_sessionmaker(
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+Base = declarative_base()
+
+def dialect_insert(db: AsyncSession):
+    """The INSERT construct of the session's dialect, which adds ON CONFLICT support."""
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        return postgresql.insert
+    if name == "sqlite":
+        return sqlite.insert
+    raise NotImplementedError(f"Upserts are not supported on {name}")
+
+async def insert_returning_ids(db: AsyncSession, model, rows: List[dict]) -> List[int]:
+    """Insert ``rows`` as a batched executemany and return the new primary keys in the order of ``rows``.
+
+    SQLite cannot batch an INSERT whose RETURNING must follow parameter order and falls back to one
+    statement per row. It does assign rowids in insertion order under its write lock, so there the
+    unordered, batched RETURNING is sorted instead.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return sorted((await db.scalars(insert(model).returning(model.id), rows)).all())
+    return list((await db.scalars(insert(model).returning(model.id, sort_by_parameter_order=True), rows)).all())
+
+async def dispose_engines() -> None:
+    """Close every pooled connection; aiosqlite keeps a non-daemon thread per connection until then."""
+    await async_engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
+    engine.dispose()
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_read_db():
+    """Session for read-only handlers; it only differs from get_db when a read replica is configured."""
+    factory = ReadSessionLocal if replica_engine is not None else AsyncSessionLocal
+    async with factory() as db:
+        yield db
@@ -0,0 +1,200 @@
+import hashlib
+import zlib
+from typing import Dict, Iterable, List, Set
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .generation import normalize_question
+from .models import Flashcard, FlashcardSignatureBucket
+from .settings import settings
+from . import metrics
+
+SHINGLE_SIZE = 4
+SIGNATURE_SIZE = 32
+BANDS = 8
+ROWS_PER_BAND = SIGNATURE_SIZE // BANDS
+
+_HASH_MULTIPLIER = 0x9E3779B1
+_HASH_MASK = (1 << 32) - 1
+_EMPTY_BIN = 1 << 32
+_LOOKUP_CHUNK_SIZE = 500
+
+duplicates_rejected = metrics.Counter(
+    "flashcard_duplicates_rejected_total",
+    "New flashcards dropped as near-duplicates of a card already in the topic",
+    ["source"]
+)
+
+def shingles(question: str) -> Set[str]:
+    text = normalize_question(question)
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    common = len(a & b)
+    return common / (len(a) + len(b) - common)
+
+def minhash(shingle_set: Iterable[str]) -> List[int]:
+    """MinHash signature via one-permutation hashing: every shingle is hashed once and kept only
+    if it is the minimum of its bin, so the cost is linear in the question length."""
+    bins = [_EMPTY_BIN] * SIGNATURE_SIZE
+    for shingle in shingle_set:
+        h = (zlib.crc32(shingle.encode()) * _HASH_MULTIPLIER) & _HASH_MASK
+        h ^= h >> 15
+        index, value = h % SIGNATURE_SIZE, h // SIGNATURE_SIZE
+        if value < bins[index]:
+            bins[index] = value
+
+    # Short questions leave bins empty; each borrows from the next filled bin (rotation densification).
+    signature = list(bins)
+    if all(value == _EMPTY_BIN for value in bins):
+        return signature
+    for i in range(SIGNATURE_SIZE):
+        offset = 0
+        while bins[(i + offset) % SIGNATURE_SIZE] == _EMPTY_BIN:
+            offset += 1
+        signature[i] = bins[(i + offset) % SIGNATURE_SIZE] + offset * _EMPTY_BIN
+    return signature
+
+def band_buckets(signature: List[int]) -> List[int]:
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(repr((band, rows)).encode(), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, "big", signed=True))
+    return buckets
+
+def question_buckets(question: str) -> List[int]:
+    return band_buckets(minhash(shingles(question)))
+
+def _bucket_rows(flashcard_id: int, topic_id: int, buckets: List[int]) -> List[dict]:
+    return [
+        {"flashcard_id" : flashcard_id, "band" : band, "topic_id" : topic_id, "bucket" : bucket}
+        for band, bucket in enumerate(buckets)
+    ]
+
+async def index_flashcard(db: AsyncSession, flashcard: Flashcard, replace: bool=False) -> None:
+    if replace:
+        await db.execute(delete(FlashcardSignatureBucket).where(FlashcardSignatureBucket.flashcard_id == flashcard.id))
+    await db.execute(
+        insert(FlashcardSignatureBucket),
+        _bucket_rows(flashcard.id, flashcard.topic_id, question_buckets(flashcard.question))
+    )
+
+class DuplicateFilter:
+    """Drops near-duplicate questions from cards about to be added to one topic.
+
+    A card is compared only with cards that share an LSH band bucket with it - stored cards of
+    the topic and cards accepted earlier by the same filter - and rejected when the Jaccard
+    similarity of their question shingles reaches the threshold. With ``reject=False`` every
+    card is kept but still gets its signature. After inserting the accepted cards, pass their
+    ids to ``index`` in the same order so later checks can find them.
+    """
+
+    def __init__(self, db: AsyncSession, topic_id: int, source: str, threshold: float=None, reject: bool=True):
+        self.db = db
+        self.topic_id = topic_id
+        self.source = source
+        self.reject = reject
+        self.threshold = settings.dedup_similarity_threshold if threshold is None else threshold
+        self._members: Dict[int, list] = {}
+        self._shingles: Dict[object, Set[str]] = {}
+        self._looked_up: Set[int] = set()
+        self._accepted = 0
+        self._unindexed: List[List[int]] = []
+
+    async def _load_candidates(self, buckets: Set[int]) -> None:
+        missing = sorted(buckets - self._looked_up)
+        for start in range(0, len(missing), _LOOKUP_CHUNK_SIZE):
+            chunk = missing[start:start + _LOOKUP_CHUNK_SIZE]
+            rows = await self.db.execute(
+                select(FlashcardSignatureBucket.bucket, Flashcard.id, Flashcard.question)
+                .join(Flashcard, Flashcard.id == FlashcardSignatureBucket.flashcard_id)
+                .where(
+                    FlashcardSignatureBucket.topic_id == self.topic_id,
+                    FlashcardSignatureBucket.bucket.in_(chunk)
+                )
+            )
+            for bucket, flashcard_id, question in rows:
+                self._members.setdefault(bucket, []).append(flashcard_id)
+                if flashcard_id not in self._shingles:
+                    self._shingles[flashcard_id] = shingles(question)
+        self._looked_up.update(missing)
+
+    def _is_duplicate(self, shingle_set: Set[str], buckets: List[int]) -> bool:
+        size = len(shingle_set)
+        checked = set()
+        for bucket in buckets:
+            for member in self._members.get(bucket, ()):
+                if member in checked:
+                    continue
+                checked.add(member)
+
+                # Jaccard similarity cannot exceed the ratio of the two set sizes.
+                other = self._shingles[member]
+                if min(size, len(other)) < self.threshold * max(size, len(other)):
+                    continue
+                if jaccard(shingle_set, other) >= self.threshold:
+                    return True
+        return False
+
+    async def filter(self, cards: List[dict]) -> List[dict]:
+        prepared = []
+        for card in cards:
+            shingle_set = shingles(card["question"])
+            prepared.append((card, shingle_set, band_buckets(minhash(shingle_set))))
+
+        if not self.reject:
+            self._unindexed.extend(buckets for _, _, buckets in prepared)
+            return list(cards)
+
+        await self._load_candidates({bucket for _, _, buckets in prepared for bucket in buckets})
+
+        kept = []
+        for card, shingle_set, buckets in prepared:
+            if self._is_duplicate(shingle_set, buckets):
+                continue
+
+            # Accepted cards join the in-memory index so later cards in the same run are checked against them.
+            member = ("new", self._accepted)
+            self._accepted += 1
+            self._shingles[member] = shingle_set
+            for bucket in buckets:
+                self._members.setdefault(bucket, []).append(member)
+            self._unindexed.append(buckets)
+            kept.append(card)
+
+        if len(kept) < len(cards):
+            duplicates_rejected.inc(len(cards) - len(kept), source=self.source)
+        return kept
+
+    async def index(self, flashcard_ids: List[int]) -> None:
+        rows = []
+        for flashcard_id, buckets in zip(flashcard_ids, self._unindexed):
+            rows.extend(_bucket_rows(flashcard_id, self.topic_id, buckets))
+        self._unindexed = self._unindexed[len(flashcard_ids):]
+
+        if rows:
+            await self.db.execute(insert(FlashcardSignatureBucket), rows)
+
+async def backfill(db: AsyncSession, batch_size: int=1000) -> int:
+    """Index cards created before duplicate detection existed."""
+    indexed = 0
+    while True:
+        flashcards = (await db.scalars(
+            select(Flashcard)
+            .where(~select(FlashcardSignatureBucket.flashcard_id).where(
+                FlashcardSignatureBucket.flashcard_id == Flashcard.id
+            ).exists())
+            .order_by(Flashcard.id)
+            .limit(batch_size)
+        )).all()
+        if not flashcards:
+            return indexed
+
+        for flashcard in flashcards:
+            await index_flashcard(db, flashcard)
+        await db.commit()
+        indexed += len(flashcards)
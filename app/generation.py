@@ -0,0 +1,146 @@
+import asyncio
+import json
+import random
+import re
+from typing import List, Optional
+import openai
+from pydantic import ValidationError
+from .schemas import FlashcardCreate
+from .settings import settings
+
+SYSTEM_PROMPT = "You are a helpful study assistant that creates educational flashcards"
+
+class GenerationError(Exception):
+    pass
+
+_client: Optional[openai.AsyncOpenAI] = None
+
+def get_client() -> openai.AsyncOpenAI:
+    global _client
+    if _client is None:
+        _client = openai.AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url or None,
+            timeout=settings.ai_request_timeout_seconds,
+            max_retries=0
+        )
+    return _client
+
+def build_prompt(topic_name: str, count: int, difficulty: str) -> str:
+    return (
+        f"Generate {count} flashcards about {topic_name} (the answer cant be more than 5 words) "
+        f"with {difficulty} difficulty. "
+        "Return as a JSON array, where each item has 'question' and 'answer' fields."
+    )
+
+def normalize_question(question: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+def _parse_cards(content: str) -> List[dict]:
+    try:
+        parsed = json.loads(content.strip())
+    except json.JSONDecodeError:
+        raise GenerationError("Invalid JSON returned from OpenAI API")
+
+    if isinstance(parsed, dict):
+        parsed = parsed.get("flashcards", next((v for v in parsed.values() if isinstance(v, list)), []))
+    if not isinstance(parsed, list):
+        raise GenerationError("Unexpected flashcard payload returned from OpenAI API")
+
+    # Model output gets the same checks as user input; malformed cards are dropped, not stored.
+    cards = []
+    for item in parsed:
+        try:
+            card = FlashcardCreate.model_validate(item)
+        except ValidationError:
+            continue
+        cards.append({"question" : card.question, "answer" : card.answer})
+
+    if parsed and not cards:
+        raise GenerationError("No valid flashcards returned from OpenAI API")
+    return cards
+
+async def _request_chunk(prompt: str) -> List[dict]:
+    response = await get_client().chat.completions.create(
+        model=settings.openai_model,
+        messages=[
+            {"role" : "system", "content" : SYSTEM_PROMPT},
+            {"role" : "user", "content" : prompt}
+        ],
+        response_format={"type" : "json_object"},
+        temperature=0.7
+    )
+    return _parse_cards(response.choices[0].message.content)
+
+def _retryable(error: Exception) -> bool:
+    # APITimeoutError is an APIConnectionError. Other 4xx responses (bad request, auth, unknown model)
+    # fail the same way on every attempt.
+    if isinstance(error, (GenerationError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+async def _request_chunk_with_retry(prompt: str, semaphore: asyncio.Semaphore) -> List[dict]:
+    async with semaphore:
+        for attempt in range(settings.ai_max_retries + 1):
+            try:
+                return await _request_chunk(prompt)
+            except (openai.APIError, GenerationError) as e:
+                if attempt == settings.ai_max_retries or not _retryable(e):
+                    raise
+
+            delay = settings.ai_retry_backoff_seconds * 2 ** attempt
+            await asyncio.sleep(delay + random.uniform(0, delay))
+
+def merge_cards(chunks: List[List[dict]], count: int) -> List[dict]:
+    seen = set()
+    cards = []
+    for chunk in chunks:
+        for card in chunk:
+            key = normalize_question(card["question"])
+            if key and key not in seen:
+                seen.add(key)
+                cards.append(card)
+    return cards[:count]
+
+async def generate_cards(topic_name: str, count: int, difficulty: str) -> List[dict]:
+    """Ask the model for ``count`` cards, split into parallel chunked requests under one time budget.
+
+    Chunks that fail or are still running when the budget runs out are dropped; an error is
+    raised only when no chunk produced cards.
+    """
+    if count < 1:
+        raise GenerationError("count must be at least 1")
+
+    chunk_size = settings.ai_chunk_size
+    chunk_counts = [min(chunk_size, count - start) for start in range(0, count, chunk_size)]
+    semaphore = asyncio.Semaphore(settings.ai_max_concurrency)
+
+    prompts = []
+    for index, chunk_count in enumerate(chunk_counts):
+        prompt = build_prompt(topic_name, chunk_count, difficulty)
+        if len(chunk_counts) > 1:
+            prompt += f" This is batch {index + 1} of {len(chunk_counts)}; avoid questions another batch would ask."
+        prompts.append(prompt)
+
+    tasks = [asyncio.create_task(_request_chunk_with_retry(prompt, semaphore)) for prompt in prompts]
+    done, pending = await asyncio.wait(tasks, timeout=settings.ai_timeout_budget_seconds)
+    for task in pending:
+        task.cancel()
+
+    chunks = []
+    errors = []
+    for task in tasks:
+        if task in done:
+            if task.exception() is None:
+                chunks.append(task.result())
+            else:
+                errors.append(task.exception())
+
+    cards = merge_cards(chunks, count)
+    if not cards:
+        if errors:
+            raise GenerationError(str(errors[0]))
+        raise GenerationError("AI generation timed out")
+    return cards
@@ -0,0 +1,85 @@
+import hashlib
+from datetime import timedelta
+from typing import List, Optional
+from sqlalchemy import delete, func, select, update
+from .database import AsyncSessionLocal
+from .generation import build_prompt, generate_cards
+from .models import GenerationCacheEntry
+from .scheduling import utcnow
+from .settings import settings
+from . import metrics
+
+generation_cache_requests = metrics.Counter(
+    "generation_cache_requests_total",
+    "Lookups in the AI generation response cache",
+    ["result"]
+)
+generation_cache_evictions = metrics.Counter(
+    "generation_cache_evictions_total",
+    "Entries removed from the AI generation response cache",
+    ["reason"]
+)
+
+def cache_key(topic_name: str, count: int, difficulty: str, model: str) -> str:
+    prompt = build_prompt(" ".join(topic_name.split()), count, (difficulty or "").strip())
+    normalized = " ".join(prompt.lower().split())
+    return hashlib.sha256(f"{model}\0{normalized}".encode()).hexdigest()
+
+async def get_cached_cards(key: str) -> Optional[List[dict]]:
+    async with AsyncSessionLocal() as db:
+        now = utcnow()
+        cards = await db.scalar(select(GenerationCacheEntry.cards).where(
+            GenerationCacheEntry.key == key,
+            GenerationCacheEntry.expires_at > now
+        ))
+
+        if cards is None:
+            generation_cache_requests.inc(result="miss")
+            return None
+
+        await db.execute(update(GenerationCacheEntry).where(GenerationCacheEntry.key == key).values(
+            hits=GenerationCacheEntry.hits + 1,
+            last_used_at=now
+        ))
+        await db.commit()
+
+    generation_cache_requests.inc(result="hit")
+    return cards
+
+async def store_cards(key: str, model: str, cards: List[dict]) -> None:
+    async with AsyncSessionLocal() as db:
+        now = utcnow()
+        await db.merge(GenerationCacheEntry(
+            key=key,
+            model=model,
+            cards=cards,
+            hits=0,
+            last_used_at=now,
+            expires_at=now + timedelta(seconds=settings.generation_cache_ttl_seconds)
+        ))
+        await db.flush()
+
+        expired = await db.execute(delete(GenerationCacheEntry).where(GenerationCacheEntry.expires_at <= now))
+        if expired.rowcount:
+            generation_cache_evictions.inc(expired.rowcount, reason="expired")
+
+        excess = await db.scalar(select(func.count(GenerationCacheEntry.key))) - settings.generation_cache_max_entries
+        if excess > 0:
+            oldest = select(GenerationCacheEntry.key).order_by(GenerationCacheEntry.last_used_at).limit(excess)
+            await db.execute(delete(GenerationCacheEntry).where(GenerationCacheEntry.key.in_(oldest)))
+            generation_cache_evictions.inc(excess, reason="capacity")
+
+        await db.commit()
+
+async def cached_generate_cards(topic_name: str, count: int, difficulty: str) -> List[dict]:
+    if not settings.generation_cache_enabled:
+        return await generate_cards(topic_name, count, difficulty)
+
+    key = cache_key(topic_name, count, difficulty, settings.openai_model)
+    cards = await get_cached_cards(key)
+    if cards is None:
+        cards = await generate_cards(topic_name, count, difficulty)
+        # Partial results (some chunks failed or timed out) are served but not cached.
+        if len(cards) >= count:
+            await store_cards(key, settings.openai_model, cards)
+    return cards
@@ -0,0 +1,62 @@
+import hashlib
+from typing import Dict, Hashable, Optional
+from fastapi import Request, Response
+from sqlalchemy import update
+from .cache import TTLCache
+from .models import Topic
+from .settings import settings
+from . import metrics
+
+# Bodies differ per user, so shared caches must not store them and clients must revalidate every time.
+CACHE_HEADERS = {"Cache-Control" : "private, no-cache", "Vary" : "Authorization"}
+
+conditional_requests = metrics.Counter(
+    "http_conditional_requests_total",
+    "Cacheable GETs by outcome: not_modified (304), cached (body from the response cache) or miss",
+    ["route", "result"]
+)
+
+_bodies = TTLCache(maxsize=settings.response_cache_max_entries, ttl=settings.response_cache_ttl_seconds)
+
+def bump_topic_version(topic_id: int):
+    """UPDATE that invalidates the topic's ETags; run it in the transaction that changes its flashcards."""
+    return update(Topic).where(Topic.id == topic_id).values(version=Topic.version + 1)
+
+def make_etag(*parts) -> str:
+    digest = hashlib.blake2b(":".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+
+    # If-None-Match uses weak comparison, so the W/ prefix is ignored on both sides.
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+def not_modified(route: str, etag: str) -> Response:
+    conditional_requests.inc(route=route, result="not_modified")
+    return Response(status_code=304, headers={"ETag" : etag, **CACHE_HEADERS})
+
+def cached_response(route: str, key: Hashable) -> Optional[Response]:
+    if not settings.response_cache_enabled:
+        return None
+
+    entry = _bodies.get(key)
+    if entry is None:
+        return None
+
+    body, headers = entry
+    conditional_requests.inc(route=route, result="cached")
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def json_response(route: str, key: Hashable, body: bytes, etag: str, headers: Dict[str, str]=None) -> Response:
+    headers = {**(headers or {}), "ETag" : etag, **CACHE_HEADERS}
+    if settings.response_cache_enabled:
+        _bodies.set(key, (body, headers))
+
+    conditional_requests.inc(route=route, result="miss")
+    return Response(content=body, media_type="application/json", headers=headers)
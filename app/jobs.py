@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import os
+import random
+import socket
+import uuid
+from datetime import timedelta
+from typing import List, Optional
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from .database import AsyncSessionLocal, insert_returning_ids
+from .dedup import DuplicateFilter
+from .generation import GenerationError
+from .generation_cache import cache_key, cached_generate_cards, get_cached_cards
+from .http_cache import bump_topic_version
+from .models import Flashcard, GenerationJob
+from .scheduling import utcnow
+from .schemas import AIFlashcardRequest
+from .settings import settings
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+jobs_processed = metrics.Counter(
+    "generation_jobs_processed_total",
+    "Generation jobs finished by this process",
+    ["status"]
+)
+
+async def enqueue_generation(db: AsyncSession, user_id: int, topic_id: int, request: AIFlashcardRequest) -> GenerationJob:
+    job = GenerationJob(
+        id=str(uuid.uuid4()),
+        user_id=user_id,
+        topic_id=topic_id,
+        status="queued",
+        request=request.model_dump()
+    )
+
+    # A cached card set is inserted right away instead of waiting for a worker.
+    cards = None
+    if settings.generation_cache_enabled:
+        cards = await get_cached_cards(cache_key(request.topic_name, request.count, request.difficulty, settings.openai_model))
+    if cards is not None:
+        job.flashcard_ids = await insert_generated_cards(db, topic_id, cards, request.difficulty)
+        job.status = "succeeded"
+        job.updated_at = utcnow()
+        jobs_processed.inc(status="succeeded")
+
+    db.add(job)
+    await db.commit()
+    return job
+
+def _claimable():
+    # Jobs left "running" by a worker that died are picked up again once their lock goes stale.
+    now = utcnow()
+    stale_before = now - timedelta(seconds=settings.job_lock_timeout_seconds)
+    return or_(
+        and_(
+            GenerationJob.status == "queued",
+            or_(GenerationJob.available_at.is_(None), GenerationJob.available_at <= now)
+        ),
+        and_(GenerationJob.status == "running", GenerationJob.locked_at < stale_before)
+    )
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff before a failed job is claimed again, with jitter so retries spread out."""
+    delay = min(settings.job_retry_backoff_max_seconds, settings.job_retry_backoff_seconds * 2 ** max(attempts - 1, 0))
+    return delay * random.uniform(0.5, 1.0)
+
+async def claim_next_job(worker_id: str) -> Optional[str]:
+    async with AsyncSessionLocal() as db:
+        job_id = await db.scalar(
+            select(GenerationJob.id).where(_claimable()).order_by(GenerationJob.created_at).limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        if job_id is None:
+            return None
+
+        # The guarded UPDATE is the actual claim; it also covers backends without SKIP LOCKED.
+        result = await db.execute(
+            update(GenerationJob).where(GenerationJob.id == job_id, _claimable()).values(
+                status="running",
+                locked_by=worker_id,
+                locked_at=utcnow(),
+                attempts=GenerationJob.attempts + 1,
+                updated_at=utcnow()
+            )
+        )
+        await db.commit()
+
+    return job_id if result.rowcount == 1 else None
+
+async def insert_generated_cards(db: AsyncSession, topic_id: int, cards: List[dict], difficulty: str) -> List[int]:
+    duplicates = DuplicateFilter(db, topic_id, source="generation")
+    cards = await duplicates.filter(cards)
+    if not cards:
+        return []
+
+    flashcard_ids = await insert_returning_ids(db, Flashcard, [
+        {
+            "topic_id" : topic_id,
+            "question" : card["question"],
+            "answer" : card["answer"],
+            "difficulty" : difficulty
+        }
+        for card in cards
+    ])
+    await duplicates.index(flashcard_ids)
+    await db.execute(bump_topic_version(topic_id))
+    return flashcard_ids
+
+async def run_job(job_id: str) -> None:
+    # Read the job in its own short transaction so no connection is held during the slow model call.
+    async with AsyncSessionLocal() as db:
+        job = await db.get(GenerationJob, job_id)
+        if job is None:
+            return
+        user_id, topic_id, attempts, payload = job.user_id, job.topic_id, job.attempts, job.request
+
+    cards = None
+    values = {"status" : "succeeded", "error" : None}
+    try:
+        request = AIFlashcardRequest.model_validate(payload)
+        cards = await cached_generate_cards(request.topic_name, request.count, request.difficulty)
+    except GenerationError as e:
+        values = {"status" : "failed", "error" : str(e)}
+        if attempts < settings.job_max_attempts:
+            values["status"] = "queued"
+            values["available_at"] = utcnow() + timedelta(seconds=retry_delay(attempts))
+    except Exception as e:
+        logger.exception("Generation job %s crashed", job_id)
+        values = {"status" : "failed", "error" : str(e)}
+
+    async with AsyncSessionLocal() as db:
+        # Let the owner read the generated cards from the primary while replicas catch up.
+        db.info["user_id"] = user_id
+        if cards is not None:
+            try:
+                values["flashcard_ids"] = await insert_generated_cards(db, topic_id, cards, request.difficulty)
+            except Exception as e:
+                logger.exception("Generation job %s crashed", job_id)
+                await db.rollback()
+                values = {"status" : "failed", "error" : str(e)}
+
+        await db.execute(update(GenerationJob).where(GenerationJob.id == job_id).values(
+            **values,
+            locked_by=None,
+            locked_at=None,
+            updated_at=utcnow()
+        ))
+        await db.commit()
+
+    if values["status"] != "queued":
+        jobs_processed.inc(status=values["status"])
+
+async def worker_loop(worker_id: str, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            job_id = await claim_next_job(worker_id)
+        except Exception:
+            logger.exception("Worker %s could not claim a job", worker_id)
+            job_id = None
+
+        if job_id is None:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=settings.job_poll_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        # A crash here must not end the task, or the pool silently loses a worker.
+        try:
+            await run_job(job_id)
+        except Exception:
+            logger.exception("Worker %s failed while running job %s", worker_id, job_id)
+
+class JobWorkerPool:
+    def __init__(self, size: int):
+        self.size = size
+        self._stop = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks = [
+            asyncio.create_task(worker_loop(f"{prefix}:{i}", self._stop))
+            for i in range(self.size)
+        ]
+
+    async def stop(self) -> None:
+        self._stop.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+async def _run_standalone() -> None:
+    pool = JobWorkerPool(settings.job_workers)
+    pool.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await pool.stop()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_run_standalone())
@@ -1,26 +1,69 @@
-from fastapi import FastAPI
-from .database import engine, Base
-from . import models
-from .routes import authentication, topics, flashcards
-
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(
-    title="Study Assistant API",
-    version="1.0.0",
-    description="AI-powered flashcard platform with automation"
-)
-
-app.include_router(authentication.router)
-
-app.include_router(topics.router)
-
-app.include_router(flashcards.router)
-
-@app.get("/")
-async def root():
-    return {
-        "message" : "Study Assistant API",
-        "version" : "1.0.0",
-        "docs" : "/docs"
-    }
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from .auth import shutdown_hash_executor
+from .database import engine, Base, dispose_engines
+from . import models
+from .jobs import JobWorkerPool
+from .profiling import ProfilingMiddleware
+from .request_metrics import RequestMetricsMiddleware, instrument_database
+from .review_log import review_log
+from .search import install_search_index
+from .settings import settings
+from .routes import authentication, topics, flashcards, search, study, progress, jobs, metrics, profiling
+
+# Deployments that manage the schema with `alembic upgrade head` set AUTO_CREATE_SCHEMA=false.
+if settings.auto_create_schema:
+    Base.metadata.create_all(bind=engine)
+    install_search_index(engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    workers = JobWorkerPool(settings.job_workers)
+    workers.start()
+    review_log.start()
+    yield
+    await review_log.stop()
+    await workers.stop()
+    shutdown_hash_executor()
+    await dispose_engines()
+
+app = FastAPI(
+    title="Study Assistant API",
+    version="1.0.0",
+    description="AI-powered flashcard platform with automation",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
+
+app.add_middleware(RequestMetricsMiddleware)
+instrument_database()
+
+app.include_router(authentication.router)
+
+app.include_router(topics.router)
+
+app.include_router(flashcards.router)
+
+app.include_router(search.router)
+
+app.include_router(study.router)
+
+app.include_router(progress.router)
+
+app.include_router(jobs.router)
+
+app.include_router(metrics.router)
+
+# Profiling is opt-in: when disabled neither the middleware nor the routes exist, so it costs nothing.
+if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware)
+    app.include_router(profiling.router)
+
+@app.get("/")
+async def root():
+    return {
+        "message" : "Study Assistant API",
+        "version" : "1.0.0",
+        "docs" : "/docs"
+    }
@@ -1,55 +1,182 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Float, func
-from sqlalchemy.orm import relationship
-from .database import Base
-
-class User(Base):
-    __tablename__ = "users"
-
-    id = Column(Integer, primary_key=True, index=True)
-    email = Column(String, unique=True, nullable=False, index=True)
-    username = Column(String, unique=True, nullable=False, index=True)
-    hashed_password = Column(String, nullable=False)
-    created_at = Column(DateTime, nullable=False, server_default=func.now())
-
-    topics = relationship("Topic", back_populates="owner", cascade="all, delete-orphan")
-    progress = relationship("UserProgress", back_populates="user", cascade="all, delete-orphan")
-
-class Topic(Base):
-    __tablename__ = "topics"
-
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, nullable=False, index=True)
-    description = Column(Text)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    created_at = Column(DateTime, nullable=False, server_default=func.now())
-
-    owner = relationship("User", back_populates="topics")
-    flashcards = relationship("Flashcard", back_populates="topic", cascade="all, delete-orphan")
-    progress = relationship("UserProgress", back_populates="topic", cascade="all, delete-orphan")
-
-class Flashcard(Base):
-    __tablename__ = "flashcards"
-
-    id = Column(Integer, primary_key=True, index=True)
-    topic_id = Column(Integer, ForeignKey("topics.id"), nullable=False)
-    question = Column(Text, nullable=False)
-    answer = Column(Text, nullable=False)
-    difficulty = Column(String, default="medium")
-    created_at = Column(DateTime, nullable=False, server_default=func.now())
-
-    topic = relationship("Topic", back_populates="flashcards")
-
-class UserProgress(Base):
-    __tablename__ = "user_progress"
-
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    topic_id = Column(Integer, ForeignKey("topics.id"), nullable=False)
-    flashcards_reviewed = Column(Integer, default=0)
-    correct_answers = Column(Integer, default=0)
-    total_answers = Column(Integer, default=0)
-    last_study_date = Column(DateTime)
-    streak_days = Column(Integer, default=0)
-
-    user = relationship("User", back_populates="progress")
-    topic = relationship("Topic", back_populates="progress")
+from sqlalchemy import BigInteger, Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Float, Index, JSON, UniqueConstraint, func
+from sqlalchemy.orm import relationship
+from .database import Base
+
+class User(Base):
+    __tablename__ = "users"
+    __mapper_args__ = {"eager_defaults" : True}
+
+    id = Column(Integer, primary_key=True, index=True)
+    email = Column(String, unique=True, nullable=False, index=True)
+    username = Column(String, unique=True, nullable=False, index=True)
+    hashed_password = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    topics = relationship("Topic", back_populates="owner", cascade="all, delete-orphan")
+    progress = relationship("UserProgress", back_populates="user", cascade="all, delete-orphan")
+    progress_summary = relationship("UserProgressSummary", cascade="all, delete-orphan", uselist=False)
+
+class Topic(Base):
+    __tablename__ = "topics"
+    __mapper_args__ = {"eager_defaults" : True}
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False, index=True)
+    description = Column(Text)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    # Bumped with every change to the topic or its flashcards; conditional GETs derive their ETags from it.
+    version = Column(Integer, nullable=False, server_default="1")
+
+    owner = relationship("User", back_populates="topics")
+    flashcards = relationship("Flashcard", back_populates="topic", cascade="all, delete-orphan")
+    progress = relationship("UserProgress", back_populates="topic", cascade="all, delete-orphan")
+    generation_jobs = relationship("GenerationJob", back_populates="topic", cascade="all, delete-orphan")
+
+class Flashcard(Base):
+    __tablename__ = "flashcards"
+    __mapper_args__ = {"eager_defaults" : True}
+    __table_args__ = (
+        Index("ix_flashcards_topic_id_id", "topic_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    topic_id = Column(Integer, ForeignKey("topics.id"), nullable=False)
+    question = Column(Text, nullable=False)
+    answer = Column(Text, nullable=False)
+    difficulty = Column(String, default="medium")
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    topic = relationship("Topic", back_populates="flashcards")
+    # Reviews and signature buckets are removed by FK cascades and bulk deletes in the delete routes,
+    # never loaded card by card.
+    reviews = relationship("CardReview", back_populates="flashcard", cascade="all, delete-orphan", passive_deletes=True)
+    signature_buckets = relationship("FlashcardSignatureBucket", cascade="all, delete-orphan", passive_deletes=True)
+
+class FlashcardSignatureBucket(Base):
+    """One LSH band of a card's MinHash signature; cards sharing a bucket in a topic are duplicate candidates."""
+    __tablename__ = "flashcard_signature_buckets"
+    __table_args__ = (
+        Index("ix_flashcard_signature_buckets_topic_bucket", "topic_id", "bucket"),
+    )
+
+    flashcard_id = Column(Integer, ForeignKey("flashcards.id", ondelete="CASCADE"), primary_key=True)
+    band = Column(Integer, primary_key=True)
+    topic_id = Column(Integer, ForeignKey("topics.id", ondelete="CASCADE"), nullable=False)
+    bucket = Column(BigInteger, nullable=False)
+
+class UserProgress(Base):
+    __tablename__ = "user_progress"
+    __table_args__ = (
+        UniqueConstraint("user_id", "topic_id", name="uq_user_progress_user_topic"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    topic_id = Column(Integer, ForeignKey("topics.id"), nullable=False, index=True)
+    flashcards_reviewed = Column(Integer, default=0)
+    correct_answers = Column(Integer, default=0)
+    total_answers = Column(Integer, default=0)
+    last_study_date = Column(DateTime)
+    streak_days = Column(Integer, default=0)
+
+    user = relationship("User", back_populates="progress")
+    topic = relationship("Topic", back_populates="progress")
+
+class UserProgressSummary(Base):
+    """Per-user rollup of UserProgress, updated with every session summary so dashboards read one row."""
+    __tablename__ = "user_progress_summaries"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    topics_studied = Column(Integer, nullable=False, default=0)
+    flashcards_reviewed = Column(Integer, nullable=False, default=0)
+    correct_answers = Column(Integer, nullable=False, default=0)
+    total_answers = Column(Integer, nullable=False, default=0)
+    current_streak = Column(Integer, nullable=False, default=0)
+    longest_streak = Column(Integer, nullable=False, default=0)
+    last_study_date = Column(DateTime)
+
+class CardReview(Base):
+    __tablename__ = "card_reviews"
+    __table_args__ = (
+        UniqueConstraint("user_id", "flashcard_id", name="uq_card_reviews_user_flashcard"),
+        Index("ix_card_reviews_user_topic_due", "user_id", "topic_id", "due_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    topic_id = Column(Integer, ForeignKey("topics.id", ondelete="CASCADE"), nullable=False)
+    flashcard_id = Column(Integer, ForeignKey("flashcards.id", ondelete="CASCADE"), nullable=False, index=True)
+    repetitions = Column(Integer, nullable=False, default=0)
+    lapses = Column(Integer, nullable=False, default=0)
+    interval_days = Column(Float, nullable=False, default=0.0)
+    ease_factor = Column(Float, nullable=False, default=2.5)
+    due_at = Column(DateTime, nullable=False)
+    last_reviewed_at = Column(DateTime)
+
+    flashcard = relationship("Flashcard", back_populates="reviews")
+
+class ReviewEvent(Base):
+    """Append-only log of every submitted answer.
+
+    There are no foreign keys and the primary key includes created_at, so on PostgreSQL the table
+    can be range-partitioned by time and old partitions detached without touching live data.
+    """
+    __tablename__ = "review_events"
+    __table_args__ = (
+        Index("ix_review_events_user_created", "user_id", "created_at"),
+        Index("ix_review_events_flashcard_created", "flashcard_id", "created_at"),
+    )
+
+    id = Column(String(36), primary_key=True)
+    created_at = Column(DateTime, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    topic_id = Column(Integer, nullable=False)
+    flashcard_id = Column(Integer, nullable=False)
+    session_id = Column(String(36), nullable=False)
+    is_correct = Column(Boolean, nullable=False)
+    quality = Column(Integer)
+    latency_ms = Column(Integer)
+
+class StudySession(Base):
+    __tablename__ = "study_sessions"
+
+    id = Column(String(36), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    data = Column(Text, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+    __mapper_args__ = {"eager_defaults" : True}
+    __table_args__ = (
+        Index("ix_generation_jobs_status_created", "status", "created_at"),
+    )
+
+    id = Column(String(36), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    topic_id = Column(Integer, ForeignKey("topics.id"), nullable=False, index=True)
+    status = Column(String, nullable=False, default="queued")
+    request = Column(JSON, nullable=False)
+    flashcard_ids = Column(JSON)
+    error = Column(Text)
+    attempts = Column(Integer, nullable=False, default=0)
+    locked_by = Column(String)
+    locked_at = Column(DateTime)
+    # A requeued job is not claimed again before this time.
+    available_at = Column(DateTime)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    updated_at = Column(DateTime)
+
+    topic = relationship("Topic", back_populates="generation_jobs")
+
+class GenerationCacheEntry(Base):
+    __tablename__ = "generation_cache"
+
+    key = Column(String(64), primary_key=True)
+    model = Column(String, nullable=False)
+    cards = Column(JSON, nullable=False)
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    last_used_at = Column(DateTime, nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,152 @@
+import cProfile
+import hmac
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional, Tuple
+from fastapi import Header, HTTPException, status
+from .cache import TTLCache
+from .settings import settings
+
+# Threads parked in these modules are waiting for work, not doing it.
+IDLE_MODULES = ("selectors.py", "threading.py", "queue.py")
+
+_profiles = TTLCache(maxsize=settings.profiling_max_stored, ttl=settings.profiling_ttl_seconds)
+# cProfile hooks the whole thread, so only one request can be profiled at a time.
+_request_profile_lock = threading.Lock()
+_sampling_lock = threading.Lock()
+
+def token_valid(token: Optional[str]) -> bool:
+    return bool(settings.profiling_token) and token is not None and hmac.compare_digest(token, settings.profiling_token)
+
+async def require_profiling_token(x_profile_token: Optional[str]=Header(None)) -> None:
+    if not token_valid(x_profile_token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid profiling token"
+        )
+
+def get_profile(profile_id: str) -> Optional[dict]:
+    return _profiles.get(profile_id)
+
+def list_profiles() -> list:
+    return [
+        {"id" : profile_id, **{key : value for key, value in profile.items() if key != "profiler"}}
+        for profile_id, profile in _profiles.items()
+    ]
+
+def format_profile(profile: dict, sort: str, limit: int) -> str:
+    buffer = io.StringIO()
+    stats = pstats.Stats(profile["profiler"], stream=buffer)
+    stats.sort_stats(sort).print_stats(limit)
+    return buffer.getvalue()
+
+def dump_profile(profile: dict) -> bytes:
+    """The .prof format written by pstats.dump_stats, for snakeviz or `python -m pstats`."""
+    profiler = profile["profiler"]
+    profiler.create_stats()
+    return marshal.dumps(profiler.stats)
+
+class ProfilingMiddleware:
+    """Runs a request under cProfile when it carries ``X-Profile: 1`` and a valid ``X-Profile-Token``.
+
+    cProfile sees everything the event loop thread runs while the request is in flight, so other
+    requests interleaved with it show up too; profile on a quiet worker or read it as a loop-wide view.
+    The response carries ``X-Profile-Id``; fetch the result from /debug/profile/requests/{id}.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        if headers.get(b"x-profile") not in (b"1", b"true") or not token_valid(headers.get(b"x-profile-token", b"").decode()):
+            await self.app(scope, receive, send)
+            return
+
+        if not _request_profile_lock.acquire(blocking=False):
+            await self.app(scope, receive, self._with_header(send, b"x-profile-status", b"busy"))
+            return
+
+        profile_id = uuid.uuid4().hex
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                await self.app(scope, receive, self._with_header(send, b"x-profile-id", profile_id.encode()))
+            finally:
+                profiler.disable()
+        finally:
+            _request_profile_lock.release()
+
+        _profiles.set(profile_id, {
+            "method" : scope["method"],
+            "path" : scope["path"],
+            "elapsed_ms" : round((time.perf_counter() - start) * 1000, 3),
+            "profiler" : profiler,
+        })
+
+    @staticmethod
+    def _with_header(send, name: bytes, value: bytes):
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (name, value)]
+            await send(message)
+        return send_wrapper
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def sample_stacks(seconds: float, interval: float, include_idle: bool=False) -> Tuple[Counter, int, int]:
+    """Sample every other thread's stack for ``seconds``; returns collapsed stacks, samples taken and idle samples.
+
+    Runs in its own thread and only reads frames, so the sampled code is never paused beyond the GIL
+    switches the sampler itself needs.
+    """
+    if not _sampling_lock.acquire(blocking=False):
+        raise RuntimeError("A sampling run is already in progress")
+
+    own = threading.get_ident()
+    stacks = Counter()
+    samples = idle = 0
+    try:
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident : thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+
+                samples += 1
+                if not include_idle and os.path.basename(frame.f_code.co_filename) in IDLE_MODULES:
+                    idle += 1
+                    continue
+
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(names.get(ident, f"thread-{ident}"))
+                stacks[";".join(reversed(labels))] += 1
+
+            time.sleep(interval)
+    finally:
+        _sampling_lock.release()
+
+    return stacks, samples, idle
+
+def collapsed(stacks: Counter) -> str:
+    """Brendan Gregg's collapsed format, as read by flamegraph.pl, speedscope and inferno."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
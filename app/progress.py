@@ -0,0 +1,151 @@
+from datetime import date, datetime, timedelta
+from typing import Iterable, Tuple
+from sqlalchemy import case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from .database import dialect_insert
+from .models import ReviewEvent, UserProgress, UserProgressSummary
+
+def _advanced_streak(streak, last_study_date, now: datetime):
+    """SQL expression for a streak after studying at ``now``: unchanged on the same day, +1 the
+    day after the last session, otherwise restarted."""
+    today = datetime(now.year, now.month, now.day)
+    return case(
+        (last_study_date.is_(None), 1),
+        (last_study_date >= today, streak),
+        (last_study_date >= today - timedelta(days=1), streak + 1),
+        else_=1
+    )
+
+def current_streak(summary: UserProgressSummary, now: datetime) -> int:
+    # A streak is only current while the last session was today or yesterday.
+    if summary.last_study_date is None or summary.last_study_date.date() < (now - timedelta(days=1)).date():
+        return 0
+    return summary.current_streak
+
+def _day(value) -> date:
+    # func.date returns a date on PostgreSQL and an ISO string on SQLite.
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+def day_streaks(days: Iterable[date]) -> Tuple[int, int]:
+    """Length of the run of consecutive days ending at the latest day, and of the longest run."""
+    current = longest = 0
+    previous = None
+    for day in sorted(set(days)):
+        current = current + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+        longest = max(longest, current)
+        previous = day
+    return current, longest
+
+async def _aggregate_progress(db: AsyncSession, user_id: int) -> dict:
+    rows = (await db.execute(select(
+        UserProgress.flashcards_reviewed,
+        UserProgress.correct_answers,
+        UserProgress.total_answers,
+        UserProgress.streak_days,
+        UserProgress.last_study_date
+    ).where(UserProgress.user_id == user_id))).all()
+
+    # The user's streak counts days with any activity: answers in the review log plus each topic's
+    # last session, which also covers sessions from before the log existed.
+    days = {_day(day) for day in await db.scalars(
+        select(func.date(ReviewEvent.created_at)).where(ReviewEvent.user_id == user_id).distinct()
+    )}
+    days.update(row.last_study_date.date() for row in rows if row.last_study_date is not None)
+    current, longest = day_streaks(days)
+
+    # A topic's own streak is a run of days the user studied, so it is a lower bound for both.
+    last_study_date = max((row.last_study_date for row in rows if row.last_study_date is not None), default=None)
+    latest_day = max(days, default=None)
+    for row in rows:
+        longest = max(longest, row.streak_days or 0)
+        if row.last_study_date is not None and row.last_study_date.date() == latest_day:
+            current = max(current, row.streak_days or 0)
+    if latest_day is not None and (last_study_date is None or latest_day > last_study_date.date()):
+        last_study_date = datetime(latest_day.year, latest_day.month, latest_day.day)
+
+    return {
+        "user_id" : user_id,
+        "topics_studied" : len(rows),
+        "flashcards_reviewed" : sum(row.flashcards_reviewed or 0 for row in rows),
+        "correct_answers" : sum(row.correct_answers or 0 for row in rows),
+        "total_answers" : sum(row.total_answers or 0 for row in rows),
+        "current_streak" : current,
+        "longest_streak" : longest,
+        "last_study_date" : last_study_date
+    }
+
+async def get_summary(db: AsyncSession, user_id: int) -> UserProgressSummary:
+    summary = await db.get(UserProgressSummary, user_id)
+    if summary is None:
+        # Users who have not finished a session since the rollup was introduced.
+        summary = UserProgressSummary(**await _aggregate_progress(db, user_id))
+    return summary
+
+async def record_session(db: AsyncSession, user_id: int, topic_id: int, reviewed: int, correct: int, now: datetime) -> int:
+    """Fold one finished session into the topic's UserProgress row and the user's rollup.
+
+    Both are single-statement atomic updates, so concurrent summaries for the same user cannot
+    lose increments. Returns the topic's streak.
+    """
+    insert = dialect_insert(db)
+    progress = insert(UserProgress).values(
+        user_id=user_id,
+        topic_id=topic_id,
+        flashcards_reviewed=reviewed,
+        correct_answers=correct,
+        total_answers=reviewed,
+        streak_days=1,
+        last_study_date=now
+    )
+    streak_days = await db.scalar(progress.on_conflict_do_update(
+        index_elements=[UserProgress.user_id, UserProgress.topic_id],
+        set_={
+            "flashcards_reviewed" : UserProgress.flashcards_reviewed + progress.excluded.flashcards_reviewed,
+            "correct_answers" : UserProgress.correct_answers + progress.excluded.correct_answers,
+            "total_answers" : UserProgress.total_answers + progress.excluded.total_answers,
+            "streak_days" : _advanced_streak(UserProgress.streak_days, UserProgress.last_study_date, now),
+            "last_study_date" : progress.excluded.last_study_date
+        }
+    ).returning(UserProgress.streak_days))
+
+    if await db.scalar(select(UserProgressSummary.user_id).where(UserProgressSummary.user_id == user_id)) is None:
+        # The first rollup is built from the progress rows, which already include this session.
+        created = await db.execute(
+            insert(UserProgressSummary).values(**await _aggregate_progress(db, user_id))
+            .on_conflict_do_nothing(index_elements=[UserProgressSummary.user_id])
+        )
+        if created.rowcount == 1:
+            return streak_days
+
+    streak = _advanced_streak(UserProgressSummary.current_streak, UserProgressSummary.last_study_date, now)
+    await db.execute(update(UserProgressSummary).where(UserProgressSummary.user_id == user_id).values(
+        topics_studied=select(func.count(UserProgress.id)).where(UserProgress.user_id == user_id).scalar_subquery(),
+        flashcards_reviewed=UserProgressSummary.flashcards_reviewed + reviewed,
+        correct_answers=UserProgressSummary.correct_answers + correct,
+        total_answers=UserProgressSummary.total_answers + reviewed,
+        current_streak=streak,
+        longest_streak=case((streak > UserProgressSummary.longest_streak, streak), else_=UserProgressSummary.longest_streak),
+        last_study_date=now
+    ))
+    return streak_days
+
+async def remove_topic(db: AsyncSession, user_id: int, topic_id: int) -> None:
+    """Take a topic's totals out of the user's rollup; run it in the transaction that deletes the topic."""
+    def topic_total(column):
+        return select(column).where(
+            UserProgress.user_id == user_id,
+            UserProgress.topic_id == topic_id
+        ).scalar_subquery()
+
+    await db.execute(update(UserProgressSummary).where(
+        UserProgressSummary.user_id == user_id,
+        select(UserProgress.id).where(
+            UserProgress.user_id == user_id,
+            UserProgress.topic_id == topic_id
+        ).exists()
+    ).values(
+        topics_studied=UserProgressSummary.topics_studied - 1,
+        flashcards_reviewed=UserProgressSummary.flashcards_reviewed - func.coalesce(topic_total(UserProgress.flashcards_reviewed), 0),
+        correct_answers=UserProgressSummary.correct_answers - func.coalesce(topic_total(UserProgress.correct_answers), 0),
+        total_answers=UserProgressSummary.total_answers - func.coalesce(topic_total(UserProgress.total_answers), 0)
+    ))
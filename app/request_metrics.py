@@ -0,0 +1,164 @@
+import logging
+import time
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from . import database, metrics
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+DB_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+request_seconds = metrics.Histogram(
+    "http_request_duration_seconds",
+    "Time to produce a response, by route template",
+    ["method", "route"]
+)
+requests_total = metrics.Counter(
+    "http_requests_total",
+    "Responses sent, by route template and status code",
+    ["method", "route", "status"]
+)
+request_queries = metrics.Histogram(
+    "db_queries_per_request",
+    "SQL statements executed while handling one request",
+    ["method", "route"],
+    buckets=QUERY_BUCKETS
+)
+request_db_seconds = metrics.Histogram(
+    "db_time_per_request_seconds",
+    "Time spent in SQL statements while handling one request",
+    ["method", "route"],
+    buckets=DB_TIME_BUCKETS
+)
+request_slowest_query_seconds = metrics.Histogram(
+    "db_slowest_query_per_request_seconds",
+    "Duration of the slowest SQL statement of each request",
+    ["method", "route"],
+    buckets=DB_TIME_BUCKETS
+)
+slow_queries = metrics.Counter(
+    "db_slow_queries_total",
+    "SQL statements slower than SLOW_QUERY_THRESHOLD_MS",
+    ["route"]
+)
+
+class RequestStats:
+    __slots__ = ("scope", "queries", "db_seconds", "slowest_seconds", "slowest_statement")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement = None
+
+    @property
+    def route(self) -> str:
+        return _route_template(self.scope)
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+def _compact(statement: str, limit: int=500) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + "..."
+
+def redact_parameters(parameters, executemany: bool=False) -> str:
+    """Describe bound parameters by type only, so slow-query logs never carry user data."""
+    if executemany:
+        return f"<{len(parameters)} parameter sets>"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: <{type(value).__name__}>" for key, value in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(f"<{type(value).__name__}>" for value in parameters) + ")"
+    return "<redacted>"
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        if elapsed > stats.slowest_seconds:
+            stats.slowest_seconds = elapsed
+            stats.slowest_statement = statement
+
+    if elapsed * 1000 >= settings.slow_query_threshold_ms:
+        route = stats.route if stats is not None else "background"
+        slow_queries.inc(route=route)
+        logger.warning(
+            "Slow query (%.1f ms) in %s: %s parameters=%s",
+            elapsed * 1000, route, _compact(statement), redact_parameters(parameters, executemany)
+        )
+
+def instrument_engine(engine: Engine) -> None:
+    if not event.contains(engine, "after_cursor_execute", _after_execute):
+        event.listen(engine, "before_cursor_execute", _before_execute)
+        event.listen(engine, "after_cursor_execute", _after_execute)
+
+def instrument_database() -> None:
+    engines = [database.engine, database.async_engine.sync_engine]
+    if database.replica_engine is not None:
+        engines.append(database.replica_engine.sync_engine)
+    for engine in engines:
+        instrument_engine(engine)
+
+class RequestMetricsMiddleware:
+    """Attributes SQL statements to the request that issued them and records per-route metrics.
+
+    A plain ASGI middleware rather than BaseHTTPMiddleware, so the handler, its dependencies and any
+    streamed body run in the context that holds this request's RequestStats.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            self._record(scope, stats, status, time.perf_counter() - start)
+
+    def _record(self, scope, stats: RequestStats, status: int, elapsed: float) -> None:
+        method = scope["method"]
+        route = stats.route
+        request_seconds.observe(elapsed, method=method, route=route)
+        requests_total.inc(method=method, route=route, status=status)
+        request_queries.observe(stats.queries, method=method, route=route)
+        request_db_seconds.observe(stats.db_seconds, method=method, route=route)
+        request_slowest_query_seconds.observe(stats.slowest_seconds, method=method, route=route)
+
+        if stats.queries >= settings.request_queries_warning or elapsed * 1000 >= settings.slow_request_threshold_ms:
+            logger.warning(
+                "%s %s took %.1f ms with %d queries (%.1f ms in the database); slowest %.1f ms: %s",
+                method, route, elapsed * 1000, stats.queries, stats.db_seconds * 1000, stats.slowest_seconds * 1000,
+                _compact(stats.slowest_statement or "-")
+            )
+
+def _route_template(scope) -> str:
+    # The router stores the matched route in the scope. Label by its template, never by the raw path,
+    # so ids in URLs do not explode the metric cardinality.
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import insert
+from .database import AsyncSessionLocal
+from .models import ReviewEvent
+from .settings import settings
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+events_written = metrics.Counter(
+    "review_events_written_total",
+    "Review events committed to the review_events log"
+)
+events_dropped = metrics.Counter(
+    "review_events_dropped_total",
+    "Review events lost because their batch could not be written"
+)
+flush_seconds = metrics.Histogram(
+    "review_events_flush_seconds",
+    "Time spent writing one batch of review events"
+)
+events_buffered = metrics.Gauge(
+    "review_events_buffered",
+    "Review events waiting for the next batch write"
+)
+
+class ReviewLogError(Exception):
+    pass
+
+class ReviewEventWriter:
+    """Buffers review events and writes them in batches: every ``batch_size`` events or every
+    ``flush_interval_ms`` milliseconds, whichever comes first.
+
+    ``append`` returns a future that resolves once the event's batch is committed, so callers
+    can wait for durability while concurrent answers share a single commit. Without a running
+    writer task (scripts, tests) every append is written immediately.
+    """
+
+    def __init__(self, batch_size: int, flush_interval_ms: int, session_factory=AsyncSessionLocal):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._session_factory = session_factory
+        self._buffer: List[Tuple[dict, asyncio.Future]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def start(self) -> None:
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            # Cancelling could interrupt a write whose batch has already left the buffer, losing those
+            # events; instead wake the loop and let it finish its current write before exiting.
+            self._stopping = True
+            self._wakeup.set()
+            await asyncio.gather(task, return_exceptions=True)
+        await self.flush()
+
+    async def append(
+            self,
+            user_id: int,
+            topic_id: int,
+            flashcard_id: int,
+            session_id: str,
+            is_correct: bool,
+            quality: Optional[int],
+            latency_ms: Optional[int],
+            created_at: datetime
+    ) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._buffer.append(({
+            "id" : str(uuid.uuid4()),
+            "created_at" : created_at,
+            "user_id" : user_id,
+            "topic_id" : topic_id,
+            "flashcard_id" : flashcard_id,
+            "session_id" : session_id,
+            "is_correct" : is_correct,
+            "quality" : quality,
+            "latency_ms" : latency_ms
+        }, future))
+        events_buffered.set(len(self._buffer))
+
+        if self._task is None:
+            await self.flush()
+        elif len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+        return future
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        while self._buffer:
+            batch = self._buffer[:self.batch_size]
+            del self._buffer[:len(batch)]
+            events_buffered.set(len(self._buffer))
+            await self._write(batch)
+
+    async def _write(self, batch: List[Tuple[dict, asyncio.Future]]) -> None:
+        start = time.perf_counter()
+        try:
+            async with self._session_factory() as db:
+                await db.execute(insert(ReviewEvent), [event for event, _ in batch])
+                await db.commit()
+        except Exception as e:
+            logger.exception("Could not write %d review events", len(batch))
+            events_dropped.inc(len(batch))
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(ReviewLogError(str(e)))
+                    # Nobody may await the future when callers do not wait for the flush.
+                    future.exception()
+            return
+
+        flush_seconds.observe(time.perf_counter() - start)
+        events_written.inc(len(batch))
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
+
+review_log = ReviewEventWriter(settings.review_log_batch_size, settings.review_log_flush_interval_ms)
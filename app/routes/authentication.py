@@ -1,60 +1,62 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from ..database import get_db
-from ..models import User
-from ..schemas import UserCreate, UserLogin, Token, UserResponse
-from ..auth import verify_password, get_password_hash, create_access_token, get_current_user
-
-router = APIRouter(
-    prefix="/auth",
-    tags=["Authentication"]
-)
-
-@router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
-async def register(
-        user: UserCreate,
-        db: Session=Depends(get_db)
-):
-    if db.query(User).filter(User.email == user.email).first():
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
-
-    if db.query(User).filter(User.username == user.username).first():
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already taken"
-        )
-
-    db_user = User(
-        email=user.email,
-        username=user.username,
-        hashed_password=get_password_hash(user.password)
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-
-    access_token = create_access_token(data={"sub" : str(db_user.id)})
-    return {"access_token" : access_token, "token_type" : "bearer"}
-
-@router.post("/login", response_model=Token, status_code=status.HTTP_201_CREATED)
-async def login(
-        user: UserLogin,
-        db: Session=Depends(get_db)
-):
-    db_user = db.query(User).filter(User.username == user.username).first()
-
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect username or password"
-        )
-
-    access_token = create_access_token(data={"sub" : str(db_user.id)})
-    return {"access_token" : access_token, "token_type" : "bearer"}
-
-@router.get("/me", response_model=UserResponse)
-async def get_me(current_user: User = Depends(get_current_user)):
-    return current_user
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_db, mark_recent_writer
+from ..models import User
+from ..schemas import UserCreate, UserLogin, Token, UserResponse
+from ..auth import verify_password_async, get_password_hash_async, create_access_token, get_current_user
+
+router = APIRouter(
+    prefix="/auth",
+    tags=["Authentication"]
+)
+
+@router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
+async def register(
+        user: UserCreate,
+        db: AsyncSession=Depends(get_db)
+):
+    if await db.scalar(select(User).where(User.email == user.email)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+
+    if await db.scalar(select(User).where(User.username == user.username)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already taken"
+        )
+
+    db_user = User(
+        email=user.email,
+        username=user.username,
+        hashed_password=await get_password_hash_async(user.password)
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    mark_recent_writer(db_user.id)
+
+    access_token = create_access_token(data={"sub" : str(db_user.id)})
+    return {"access_token" : access_token, "token_type" : "bearer"}
+
+@router.post("/login", response_model=Token, status_code=status.HTTP_201_CREATED)
+async def login(
+        user: UserLogin,
+        db: AsyncSession=Depends(get_db)
+):
+    db_user = await db.scalar(select(User).where(User.username == user.username))
+
+    if not db_user or not await verify_password_async(user.password, db_user.hashed_password):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password"
+        )
+
+    access_token = create_access_token(data={"sub" : str(db_user.id)})
+    return {"access_token" : access_token, "token_type" : "bearer"}
+
+@router.get("/me", response_model=UserResponse)
+async def get_me(current_user: User = Depends(get_current_user)):
+    return current_user
@@ -1,247 +1,367 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-import json
-import openai
-from ..database import get_db
-from ..models import User, Topic, Flashcard, UserProgress
-from ..schemas import FlashcardResponse, FlashcardCreate, FlashcardUpdate, AIFlashcardRequest
-from ..auth import get_current_user, decode_access_token
-from ..settings import settings
-from datetime import datetime, timezone
-
-router = APIRouter(
-    prefix="/topics/{topic_id}/flashcards",
-    tags=["Flashcards"]
-)
-openai.api_key = settings.openai_api_key
-
-@router.post("", response_model=FlashcardResponse, status_code=status.HTTP_201_CREATED)
-async def create_flashcard(
-        topic_id: int,
-        flashcard: FlashcardCreate,
-        current_user: User=Depends(get_current_user),
-        db: Session = Depends(get_db)
-):
-    topic = db.query(Topic).filter(
-        Topic.id == topic_id,
-        Topic.user_id == current_user.id
-    ).first()
-
-    if not topic:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Topic not found"
-        )
-
-    db_flashcard = Flashcard(
-        topic_id=topic_id,
-        question=flashcard.question,
-        answer=flashcard.answer,
-        difficulty=flashcard.difficulty
-    )
-    db.add(db_flashcard)
-    db.commit()
-    db.refresh(db_flashcard)
-
-    return db_flashcard
-
-@router.get("", response_model=List[FlashcardResponse])
-async def get_flashcards(
-        topic_id: int,
-        current_user: User=Depends(get_current_user),
-        db: Session = Depends(get_db)
-):
-    topic = db.query(Topic).filter(
-        Topic.id == topic_id,
-        Topic.user_id == current_user.id
-    ).first()
-
-    if not topic:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Topic not found"
-        )
-
-    return topic.flashcards
-
-@router.get("/{flashcard_id}", response_model=FlashcardResponse)
-async def get_flashcard(
-        topic_id: int,
-        flashcard_id: int,
-        current_user: User=Depends(get_current_user),
-        db: Session = Depends(get_db)
-):
-    topic = db.query(Topic).filter(
-        Topic.id == topic_id,
-        Topic.user_id == current_user.id
-    ).first()
-
-    if not topic:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Topic not found"
-        )
-
-    flashcard = db.query(Flashcard).filter(
-        Flashcard.id == flashcard_id,
-        Flashcard.topic_id == topic_id
-    ).first()
-
-    if not flashcard:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Flashcard not found"
-        )
-
-    return flashcard
-
-@router.patch("/{flashcard_id}", response_model=FlashcardResponse)
-async def update_flashcard(
-        topic_id: int,
-        flashcard_id: int,
-        flashcard_update: FlashcardUpdate,
-        current_user: User=Depends(get_current_user),
-        db: Session = Depends(get_db)
-):
-    topic = db.query(Topic).filter(
-        Topic.id == topic_id,
-        Topic.user_id == current_user.id
-    ).first()
-
-    if not topic:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Topic not found"
-        )
-
-    flashcard = db.query(Flashcard).filter(
-        Flashcard.id == flashcard_id,
-        Flashcard.topic_id == topic_id
-    ).first()
-
-    if not flashcard:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Flashcard not found"
-        )
-
-    if flashcard_update.question is not None:
-        flashcard.question = flashcard_update.question
-    if flashcard_update.answer is not None:
-        flashcard.answer = flashcard_update.answer
-    if flashcard_update.difficulty is not None:
-        flashcard.difficulty = flashcard_update.difficulty
-
-    db.commit()
-    db.refresh(flashcard)
-
-    return flashcard
-
-@router.delete("/{flashcard_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_flashcard(
-        topic_id: int,
-        flashcard_id: int,
-        current_user: User=Depends(get_current_user),
-        db: Session = Depends(get_db)
-):
-    topic = db.query(Topic).filter(
-        Topic.id == topic_id,
-        Topic.user_id == current_user.id
-    ).first()
-
-    if not topic:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Topic not found"
-        )
-
-    flashcard = db.query(Flashcard).filter(
-        Flashcard.id == flashcard_id,
-        Flashcard.topic_id == topic_id
-    ).first()
-
-    if not flashcard:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Flashcard not found"
-        )
-
-    db.delete(flashcard)
-    db.commit()
-
-@router.post("/generate", response_model=List[FlashcardResponse], status_code=status.HTTP_201_CREATED)
-async def generate_flashcards(
-        topic_id: int,
-        request: AIFlashcardRequest,
-        current_user: User=Depends(get_current_user),
-        db: Session=Depends(get_db)
-):
-    topic = db.query(Topic).filter(
-        Topic.id == topic_id,
-        Topic.user_id == current_user.id
-    ).first()
-
-    if not topic:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Topic not found"
-        )
-
-    if not settings.openai_api_key:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="AI generation not configured. Please set OPENAI_API_KEY"
-        )
-
-    prompt = (
-        f"Generate {request.count} flashcards about {request.topic_name} (the answer cant be more than 5 words) "
-        f"with {request.difficulty} difficulty. "
-        "Return as a JSON array, where each item has 'question' and 'answer' fields."
-    )
-
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role" : "system", "content" : "You are a helpful study assistant that creates educational flashcards"},
-                {"role" : "user", "content" : prompt}
-            ],
-            response_format={"type" : "json_object"},
-            temperature=0.7
-        )
-
-        content = response.choices[0].message.content.strip()
-        try:
-            parsed = json.loads(content)
-            flashcards_data = parsed.get("flashcards", parsed)
-        except json.JSONDecodeError:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Invalid JSON returned from OpenAI API"
-            )
-
-        flashcards = []
-        for fc in flashcards_data[:request.count]:
-            db_flashcard = Flashcard(
-                topic_id=topic.id,
-                question=fc.get("question", "No question"),
-                answer=fc.get("answer", "No answer"),
-                difficulty=request.difficulty
-            )
-            db.add(db_flashcard)
-            flashcards.append(db_flashcard)
-
-        db.commit()
-        return flashcards
-
-    except openai.APIError as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e)
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e)
-        )
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+import asyncio
+import orjson
+from ..database import get_db, get_read_db, insert_returning_ids, AsyncSessionLocal
+from ..models import User, Topic, Flashcard, CardReview, FlashcardSignatureBucket, UserProgress
+from ..schemas import (
+    FlashcardResponse, FlashcardCreate, FlashcardUpdate, AIFlashcardRequest, GenerationJobResponse, FlashcardImportResult,
+    read_flashcard
+)
+from ..auth import get_current_user, decode_access_token
+from ..settings import settings
+from ..jobs import enqueue_generation
+from ..dedup import DuplicateFilter, index_flashcard
+from ..bulk import MEDIA_TYPES, RowError, iter_import_rows, take_rows, format_chunk, format_footer
+from ..http_cache import CACHE_HEADERS, bump_topic_version, make_etag, etag_matches, not_modified, cached_response, json_response
+from datetime import datetime, timezone
+
+router = APIRouter(
+    prefix="/topics/{topic_id}/flashcards",
+    tags=["Flashcards"]
+)
+
+ExportFormat = Literal["csv", "tsv", "json", "ndjson"]
+
+async def _stream_flashcards(query, format: str="ndjson"):
+    # The request session is closed once the handler returns, so the stream owns its own.
+    wrote_any = False
+    async with AsyncSessionLocal() as db:
+        result = await db.stream_scalars(query.execution_options(yield_per=settings.flashcards_stream_chunk_size))
+        async for chunk in result.partitions():
+            yield format_chunk(chunk, format, first=not wrote_any)
+            wrote_any = True
+
+    yield format_footer(format, wrote_any)
+
+def _row_error_message(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in error.errors())
+    return str(error)
+
+@router.post("", response_model=FlashcardResponse, status_code=status.HTTP_201_CREATED)
+async def create_flashcard(
+        topic_id: int,
+        flashcard: FlashcardCreate,
+        current_user: User=Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    topic = await db.scalar(select(Topic).where(
+        Topic.id == topic_id,
+        Topic.user_id == current_user.id
+    ))
+
+    if not topic:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Topic not found"
+        )
+
+    db_flashcard = Flashcard(
+        topic_id=topic_id,
+        question=flashcard.question,
+        answer=flashcard.answer,
+        difficulty=flashcard.difficulty
+    )
+    db.add(db_flashcard)
+    await db.flush()
+    await index_flashcard(db, db_flashcard)
+    await db.execute(bump_topic_version(topic_id))
+    await db.commit()
+    await db.refresh(db_flashcard)
+
+    return db_flashcard
+
+@router.get("", response_model=List[FlashcardResponse])
+async def get_flashcards(
+        topic_id: int,
+        request: Request,
+        limit: Optional[int]=Query(None, ge=1, le=settings.flashcards_page_max_limit),
+        after: Optional[int]=Query(None, ge=0),
+        stream: bool=False,
+        current_user: User=Depends(get_current_user),
+        db: AsyncSession = Depends(get_read_db)
+):
+    # Reading the version before the rows means a concurrent write can only make the ETag stale, never too new.
+    version = await db.scalar(select(Topic.version).where(
+        Topic.id == topic_id,
+        Topic.user_id == current_user.id
+    ))
+
+    if version is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Topic not found"
+        )
+
+    etag = make_etag("flashcards", topic_id, version, limit, after, stream)
+    if etag_matches(request, etag):
+        return not_modified("flashcards", etag)
+
+    query = select(Flashcard).where(Flashcard.topic_id == topic_id).order_by(Flashcard.id)
+    if after is not None:
+        query = query.where(Flashcard.id > after)
+    if limit is not None:
+        query = query.limit(limit)
+
+    if stream:
+        return StreamingResponse(_stream_flashcards(query), media_type="application/x-ndjson", headers={"ETag" : etag, **CACHE_HEADERS})
+
+    cached = cached_response("flashcards", etag)
+    if cached is not None:
+        return cached
+
+    flashcards = (await db.scalars(query)).all()
+    headers = {}
+    if limit is not None and len(flashcards) == limit:
+        headers["X-Next-Cursor"] = str(flashcards[-1].id)
+
+    body = orjson.dumps([read_flashcard(flashcard) for flashcard in flashcards])
+    return json_response("flashcards", etag, body, etag, headers)
+
+@router.post("/import", response_model=FlashcardImportResult, status_code=status.HTTP_201_CREATED)
+async def import_flashcards(
+        topic_id: int,
+        file: UploadFile,
+        format: ExportFormat=Query("csv"),
+        batch_size: int=Query(settings.import_batch_size, ge=1, le=settings.import_max_batch_size),
+        skip_duplicates: bool=True,
+        current_user: User=Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    topic = await db.scalar(select(Topic).where(
+        Topic.id == topic_id,
+        Topic.user_id == current_user.id
+    ))
+
+    if not topic:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Topic not found"
+        )
+
+    imported = 0
+    duplicates = 0
+    failed = 0
+    errors = []
+    batch = []
+    duplicate_filter = DuplicateFilter(db, topic.id, source="import", reject=skip_duplicates)
+
+    async def flush():
+        nonlocal imported, duplicates, batch
+        if not batch:
+            return
+
+        rows = await duplicate_filter.filter(batch)
+        duplicates += len(batch) - len(rows)
+        batch = []
+        if rows:
+            flashcard_ids = await insert_returning_ids(db, Flashcard, rows)
+            await duplicate_filter.index(flashcard_ids)
+            await db.execute(bump_topic_version(topic.id))
+            await db.commit()
+            imported += len(rows)
+
+    rows = iter_import_rows(file.file, format)
+    row_number = 0
+    while True:
+        # The upload is a synchronous spooled file, so parsing runs in a worker thread, one batch at a time.
+        chunk, parse_error = await asyncio.to_thread(take_rows, rows, batch_size)
+        for row_number, row in chunk:
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                if not isinstance(row, dict):
+                    raise RowError("Expected an object with 'question' and 'answer'")
+                card = FlashcardCreate.model_validate(row)
+            except (RowError, ValidationError) as e:
+                failed += 1
+                if len(errors) < settings.import_max_errors:
+                    errors.append({"row" : row_number, "error" : _row_error_message(e)})
+                continue
+
+            batch.append({
+                "topic_id" : topic.id,
+                "question" : card.question,
+                "answer" : card.answer,
+                "difficulty" : card.difficulty or "medium"
+            })
+            if len(batch) >= batch_size:
+                await flush()
+
+        if parse_error is not None:
+            # The rest of the upload cannot be parsed; keep what was read so far and report where it stopped.
+            failed += 1
+            errors.append({"row" : row_number + 1, "error" : str(parse_error)})
+            break
+        if len(chunk) < batch_size:
+            break
+
+    await flush()
+
+    return {"imported" : imported, "duplicates" : duplicates, "failed" : failed, "errors" : errors}
+
+@router.get("/export")
+async def export_flashcards(
+        topic_id: int,
+        format: ExportFormat=Query("csv"),
+        current_user: User=Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    topic = await db.scalar(select(Topic).where(
+        Topic.id == topic_id,
+        Topic.user_id == current_user.id
+    ))
+
+    if not topic:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Topic not found"
+        )
+
+    query = select(Flashcard).where(Flashcard.topic_id == topic.id).order_by(Flashcard.id)
+    return StreamingResponse(
+        _stream_flashcards(query, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition" : f'attachment; filename="topic-{topic.id}.{format}"'}
+    )
+
+@router.get("/{flashcard_id}", response_model=FlashcardResponse)
+async def get_flashcard(
+        topic_id: int,
+        flashcard_id: int,
+        current_user: User=Depends(get_current_user),
+        db: AsyncSession = Depends(get_read_db)
+):
+    topic = await db.scalar(select(Topic).where(
+        Topic.id == topic_id,
+        Topic.user_id == current_user.id
+    ))
+
+    if not topic:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Topic not found"
+        )
+
+    flashcard = await db.scalar(select(Flashcard).where(
+        Flashcard.id == flashcard_id,
+        Flashcard.topic_id == topic_id
+    ))
+
+    if not flashcard:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Flashcard not found"
+        )
+
+    return flashcard
+
+@router.patch("/{flashcard_id}", response_model=FlashcardResponse)
+async def update_flashcard(
+        topic_id: int,
+        flashcard_id: int,
+        flashcard_update: FlashcardUpdate,
+        current_user: User=Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    topic = await db.scalar(select(Topic).where(
+        Topic.id == topic_id,
+        Topic.user_id == current_user.id
+    ))
+
+    if not topic:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Topic not found"
+        )
+
+    flashcard = await db.scalar(select(Flashcard).where(
+        Flashcard.id == flashcard_id,
+        Flashcard.topic_id == topic_id
+    ))
+
+    if not flashcard:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Flashcard not found"
+        )
+
+    if flashcard_update.question is not None and flashcard_update.question != flashcard.question:
+        flashcard.question = flashcard_update.question
+        await index_flashcard(db, flashcard, replace=True)
+    if flashcard_update.answer is not None:
+        flashcard.answer = flashcard_update.answer
+    if flashcard_update.difficulty is not None:
+        flashcard.difficulty = flashcard_update.difficulty
+
+    await db.execute(bump_topic_version(topic_id))
+    await db.commit()
+    await db.refresh(flashcard)
+
+    return flashcard
+
+@router.delete("/{flashcard_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_flashcard(
+        topic_id: int,
+        flashcard_id: int,
+        current_user: User=Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    topic = await db.scalar(select(Topic).where(
+        Topic.id == topic_id,
+        Topic.user_id == current_user.id
+    ))
+
+    if not topic:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Topic not found"
+        )
+
+    flashcard = await db.scalar(select(Flashcard).where(
+        Flashcard.id == flashcard_id,
+        Flashcard.topic_id == topic_id
+    ))
+
+    if not flashcard:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Flashcard not found"
+        )
+
+    await db.execute(delete(CardReview).where(CardReview.flashcard_id == flashcard.id))
+    await db.execute(delete(FlashcardSignatureBucket).where(FlashcardSignatureBucket.flashcard_id == flashcard.id))
+    await db.delete(flashcard)
+    await db.execute(bump_topic_version(topic_id))
+    await db.commit()
+
+@router.post("/generate", response_model=GenerationJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def generate_flashcards(
+        topic_id: int,
+        request: AIFlashcardRequest,
+        current_user: User=Depends(get_current_user),
+        db: AsyncSession=Depends(get_db)
+):
+    topic = await db.scalar(select(Topic).where(
+        Topic.id == topic_id,
+        Topic.user_id == current_user.id
+    ))
+
+    if not topic:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Topic not found"
+        )
+
+    if not settings.openai_api_key:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="AI generation not configured. Please set OPENAI_API_KEY"
+        )
+
+    return await enqueue_generation(db, current_user.id, topic.id, request)
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_db
+from ..models import User, GenerationJob
+from ..schemas import GenerationJobResponse
+from ..auth import get_current_user
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["Jobs"]
+)
+
+@router.get("/{job_id}", response_model=GenerationJobResponse)
+async def get_job(
+        job_id: str,
+        current_user: User=Depends(get_current_user),
+        db: AsyncSession=Depends(get_db)
+):
+    job = await db.scalar(select(GenerationJob).where(
+        GenerationJob.id == job_id,
+        GenerationJob.user_id == current_user.id
+    ))
+
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+
+    return job
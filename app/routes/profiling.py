@@ -0,0 +1,59 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse, Response
+from typing import Literal
+from ..profiling import (
+    require_profiling_token, get_profile, list_profiles, format_profile, dump_profile, sample_stacks, collapsed
+)
+from ..settings import settings
+
+router = APIRouter(
+    prefix="/debug/profile",
+    tags=["Profiling"],
+    dependencies=[Depends(require_profiling_token)]
+)
+
+@router.get("/sample", response_class=PlainTextResponse)
+async def sample(
+        seconds: float=Query(10.0, gt=0, le=settings.profiling_max_seconds),
+        interval_ms: float=Query(5.0, ge=1, le=1000),
+        include_idle: bool=False
+):
+    try:
+        stacks, samples, idle = await asyncio.to_thread(sample_stacks, seconds, interval_ms / 1000, include_idle)
+    except RuntimeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+
+    return PlainTextResponse(
+        collapsed(stacks),
+        headers={"X-Samples" : str(samples), "X-Idle-Samples" : str(idle)}
+    )
+
+@router.get("/requests")
+async def get_request_profiles():
+    return list_profiles()
+
+@router.get("/requests/{profile_id}")
+async def get_request_profile(
+        profile_id: str,
+        format: Literal["text", "pstats"]="text",
+        sort: Literal["cumulative", "tottime", "calls", "ncalls"]="cumulative",
+        limit: int=Query(50, ge=1, le=1000)
+):
+    profile = get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+
+    if format == "pstats":
+        return Response(
+            dump_profile(profile),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition" : f'attachment; filename="{profile_id}.prof"'}
+        )
+    return PlainTextResponse(format_profile(profile, sort, limit))
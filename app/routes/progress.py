@@ -0,0 +1,98 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_db
+from ..models import User, Topic, UserProgress
+from ..schemas import OverallProgressResponse, ProgressResponse
+from ..settings import settings
+from ..auth import get_current_user
+from ..progress import current_streak, get_summary
+from ..scheduling import utcnow
+
+router = APIRouter(
+    prefix="/progress",
+    tags=["Progress"]
+)
+
+def _accuracy(correct: int, total: int) -> float:
+    return round(correct / total * 100, 2) if total else 0.0
+
+def _topic_progress(progress: UserProgress, topic_name: str) -> dict:
+    return {
+        "topic_id" : progress.topic_id,
+        "topic_name" : topic_name,
+        "flashcards_reviewed" : progress.flashcards_reviewed,
+        "accuracy" : _accuracy(progress.correct_answers, progress.total_answers),
+        "streak_days" : progress.streak_days,
+        "last_study_date" : progress.last_study_date
+    }
+
+def _progress_by_topic(user_id: int):
+    return (
+        select(UserProgress, Topic.name)
+        .join(Topic, Topic.id == UserProgress.topic_id)
+        .where(UserProgress.user_id == user_id)
+        .order_by(UserProgress.last_study_date.desc(), UserProgress.topic_id)
+    )
+
+@router.get("", response_model=OverallProgressResponse)
+async def get_progress(
+        include_topics: bool=False,
+        current_user: User=Depends(get_current_user),
+        db: AsyncSession=Depends(get_db)
+):
+    # The dashboard reads only the one-row summary. The per-topic breakdown is paged at /progress/topics;
+    # include_topics=true still inlines all of it, at a cost that grows with the number of topics.
+    summary = await get_summary(db, current_user.id)
+
+    topics = []
+    if include_topics:
+        rows = await db.execute(_progress_by_topic(current_user.id))
+        topics = [_topic_progress(progress, topic_name) for progress, topic_name in rows]
+
+    return {
+        "total_topics" : summary.topics_studied,
+        "total_flashcards_reviewed" : summary.flashcards_reviewed,
+        "overall_accuracy" : _accuracy(summary.correct_answers, summary.total_answers),
+        "current_streak" : current_streak(summary, utcnow()),
+        "longest_streak" : summary.longest_streak,
+        "topics" : topics
+    }
+
+@router.get("/topics", response_model=List[ProgressResponse])
+async def get_progress_by_topic(
+        limit: int=Query(20, ge=1, le=settings.progress_topics_max_limit),
+        offset: int=Query(0, ge=0),
+        current_user: User=Depends(get_current_user),
+        db: AsyncSession=Depends(get_db)
+):
+    rows = await db.execute(_progress_by_topic(current_user.id).limit(limit).offset(offset))
+    return [_topic_progress(progress, topic_name) for progress, topic_name in rows]
+
+@router.get("/topics/{topic_id}", response_model=ProgressResponse)
+async def get_topic_progress(
+        topic_id: int,
+        current_user: User=Depends(get_current_user),
+        db: AsyncSession=Depends(get_db)
+):
+    topic = await db.scalar(select(Topic).where(
+        Topic.id == topic_id,
+        Topic.user_id == current_user.id
+    ))
+
+    if not topic:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Topic not found"
+        )
+
+    progress = await db.scalar(select(UserProgress).where(
+        UserProgress.user_id == current_user.id,
+        UserProgress.topic_id == topic.id
+    ))
+
+    if not progress:
+        progress = UserProgress(topic_id=topic.id, flashcards_reviewed=0, correct_answers=0, total_answers=0, streak_days=0)
+
+    return _topic_progress(progress, topic.name)
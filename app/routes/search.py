@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from ..database import get_db
+from ..models import User
+from ..schemas import FlashcardSearchResult
+from ..auth import get_current_user
+from ..search import search_flashcards, SearchNotSupported
+from ..settings import settings
+
+router = APIRouter(
+    prefix="/flashcards",
+    tags=["Search"]
+)
+
+@router.get("/search", response_model=List[FlashcardSearchResult])
+async def search(
+        q: str=Query(..., min_length=1),
+        topic_id: Optional[int]=None,
+        limit: int=Query(20, ge=1, le=settings.search_max_limit),
+        offset: int=Query(0, ge=0),
+        current_user: User=Depends(get_current_user),
+        db: AsyncSession=Depends(get_db)
+):
+    try:
+        return await search_flashcards(db, current_user.id, q, limit, offset, topic_id)
+    except SearchNotSupported:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Search is not available on this database"
+        )
@@ -1,30 +1,236 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
 import uuid
 import random
-from ..database import get_db
-from ..models import User, Topic, Flashcard, UserProgress
-from ..schemas import StudySessionResponse, FlashcardAnswerSubmit, FlashcardAnswerResponse, SessionSummary
+import time
+from ..database import get_db, dialect_insert
+from ..models import User, Topic, Flashcard, CardReview
+from ..schemas import (
+    StudySessionResponse, FlashcardAnswerItem, FlashcardAnswerSubmit, FlashcardAnswerResponse,
+    FlashcardAnswerBatch, FlashcardAnswerBatchResponse, SessionSummary
+)
 from ..auth import get_current_user
+from ..session_store import session_store
+from ..progress import record_session
+from ..review_log import review_log, ReviewLogError
+from ..scheduling import utcnow, answer_quality, apply_review
+from ..settings import settings
 
 router = APIRouter(
-	prefix="/study",
-	tags=["Study Sessions"]
+    prefix="/study",
+    tags=["Study Sessions"]
 )
 
-active_sessions = {}
+async def _get_user_session(session_id: str, current_user: User) -> dict:
+    session = await session_store.get(session_id)
+
+    if session is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found"
+        )
+
+    if session["user_id"] != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not your session"
+        )
+
+    return session
+
+async def _due_flashcard_ids(db: AsyncSession, user_id: int, topic_id: int, limit: int) -> List[int]:
+    due = await db.scalars(select(CardReview.flashcard_id).where(
+        CardReview.user_id == user_id,
+        CardReview.topic_id == topic_id,
+        CardReview.due_at <= utcnow()
+    ).order_by(CardReview.due_at).limit(limit))
+    flashcard_ids = list(due)
+
+    if len(flashcard_ids) < limit:
+        unseen = await db.scalars(select(Flashcard.id).outerjoin(
+            CardReview,
+            (CardReview.flashcard_id == Flashcard.id) & (CardReview.user_id == user_id)
+        ).where(
+            Flashcard.topic_id == topic_id,
+            CardReview.id.is_(None)
+        ).order_by(Flashcard.id).limit(limit - len(flashcard_ids)))
+        flashcard_ids.extend(unseen)
+
+    return flashcard_ids
+
+async def _record_reviews(db: AsyncSession, user_id: int, topic_id: int, results: List[dict]) -> None:
+    latest = {r["flashcard_id"] : answer_quality(r["is_correct"], r.get("quality")) for r in results}
+    if not latest:
+        return
+
+    now = utcnow()
+
+    # Create missing rows first so the locking read below covers every card; concurrent summaries
+    # touching the same cards then apply their reviews one after the other.
+    # Cards deleted during the session are skipped.
+    insert = dialect_insert(db)
+    await db.execute(insert(CardReview).from_select(
+        ["user_id", "topic_id", "flashcard_id", "repetitions", "lapses", "interval_days", "ease_factor", "due_at"],
+        select(
+            literal(user_id),
+            literal(topic_id),
+            Flashcard.id,
+            literal(0),
+            literal(0),
+            literal(0.0),
+            literal(2.5),
+            literal(now)
+        ).where(Flashcard.id.in_(latest.keys()))
+    ).on_conflict_do_nothing(index_elements=[CardReview.user_id, CardReview.flashcard_id]))
+
+    reviews = await db.scalars(select(CardReview).where(
+        CardReview.user_id == user_id,
+        CardReview.flashcard_id.in_(latest.keys())
+    ).with_for_update())
+
+    for review in reviews:
+        apply_review(review, latest[review.flashcard_id], now)
+
+async def _load_cards(db: AsyncSession, flashcard_ids: List[int]) -> dict:
+    rows = await db.execute(select(Flashcard.id, Flashcard.question, Flashcard.answer).where(
+        Flashcard.id.in_(flashcard_ids)
+    ))
+    return {str(id) : {"id" : id, "question" : question, "answer" : answer} for id, question, answer in rows}
+
+async def _session_topic_name(db: AsyncSession, session: dict) -> str:
+    # Sessions started before the topic name was kept in the session state look it up once here.
+    if "topic_name" not in session:
+        session["topic_name"] = await db.scalar(select(Topic.name).where(Topic.id == session["topic_id"]))
+    return session["topic_name"]
+
+async def _fill_window(db: AsyncSession, session: dict, count: int) -> bool:
+    """Make sure the bodies of the next ``count`` cards are in the session's card window.
+
+    Only a window of bodies ahead of current_index is kept, so the session state saved after every
+    answer stays small whatever the deck size. A miss refills at least STUDY_CARD_WINDOW cards with
+    one IN query. Returns whether anything was loaded.
+    """
+    cards = session.setdefault("cards", {})
+    start = session["current_index"]
+    if all(str(id) in cards for id in session["flashcards"][start:start + count]):
+        return False
+
+    window = session["flashcards"][start:start + max(count, settings.study_card_window)]
+    cards.update(await _load_cards(db, [id for id in window if str(id) not in cards]))
+    return True
+
+def _trim_window(session: dict) -> None:
+    start = session["current_index"]
+    ahead = {str(id) for id in session["flashcards"][start:start + settings.study_card_window + settings.study_prefetch_max]}
+    session["cards"] = {key : card for key, card in session["cards"].items() if key in ahead}
+
+def _upcoming(session: dict, cards: dict, count: int) -> List[dict]:
+    start = session["current_index"] + 1
+    return [cards[str(id)] for id in session["flashcards"][start:start + count] if str(id) in cards]
+
+def _session_progress(session: dict) -> dict:
+    total_answered = len(session["results"])
+    correct_count = sum(1 for r in session["results"] if r["is_correct"])
+    accuracy = (correct_count / total_answered * 100) if total_answered > 0 else 0
+
+    return {
+        "answered" : total_answered,
+        "correct" : correct_count,
+        "accuracy" : round(accuracy, 2),
+        "remaining" : len(session["flashcards"]) - total_answered
+    }
+
+async def _apply_answers(
+        db: AsyncSession,
+        session_id: str,
+        session: dict,
+        answers: List[FlashcardAnswerItem],
+        user_id: int,
+        lookahead: int=1
+) -> dict:
+    """Record ``answers`` and advance the session; returns the bodies of the answered cards."""
+    remaining = len(session["flashcards"]) - session["current_index"]
+    if len(answers) > remaining:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Only {remaining} flashcards left in this session"
+        )
+
+    in_session = set(session["flashcards"])
+    if any(answer.flashcard_id not in in_session for answer in answers):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Flashcard not found"
+        )
+
+    cards = session.setdefault("cards", {})
+    missing = [answer.flashcard_id for answer in answers if str(answer.flashcard_id) not in cards]
+    if missing:
+        cards.update(await _load_cards(db, missing))
+    answered = {str(answer.flashcard_id) : cards.get(str(answer.flashcard_id)) for answer in answers}
+    if None in answered.values():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Flashcard not found"
+        )
+
+    # Without a client-side timing, the latency of a single answer is the time since its card was served.
+    now = time.time()
+    server_latency_ms = None
+    if len(answers) == 1 and session.get("card_shown_at"):
+        server_latency_ms = int((now - session["card_shown_at"]) * 1000)
+
+    recorded = []
+    for answer in answers:
+        recorded.append(await review_log.append(
+            user_id=user_id,
+            topic_id=session["topic_id"],
+            flashcard_id=answer.flashcard_id,
+            session_id=session_id,
+            is_correct=answer.is_correct,
+            quality=answer.quality,
+            latency_ms=answer.latency_ms if answer.latency_ms is not None else server_latency_ms,
+            created_at=utcnow()
+        ))
+    if settings.review_log_wait_for_flush:
+        try:
+            for future in recorded:
+                await future
+        except ReviewLogError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Answer could not be recorded, please retry"
+            )
+
+    for answer in answers:
+        session["results"].append({
+            "flashcard_id" : answer.flashcard_id,
+            "is_correct" : answer.is_correct,
+            "quality" : answer.quality
+        })
+
+    session["current_index"] += len(answers)
+    session["card_shown_at"] = now
+    _trim_window(session)
+    await _fill_window(db, session, lookahead)
+    await session_store.save(session_id, session)
+    return answered
 
 @router.post("/topics/{topic_id}/start", response_model=StudySessionResponse, status_code=status.HTTP_201_CREATED)
 async def start_study_session(
-	topic_id: int,
-	current_user: User=Depends(get_current_user),
-    db: Session = Depends(get_db)
+        topic_id: int,
+        mode: Literal["all", "due"]="all",
+        limit: Optional[int]=Query(None, ge=1, le=settings.study_due_max_limit),
+        prefetch: int=Query(0, ge=0, le=settings.study_prefetch_max),
+        current_user: User=Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
 ):
-    topic = db.query(Topic).filter(
+    topic = await db.scalar(select(Topic).where(
         Topic.id == topic_id,
         Topic.user_id == current_user.id
-    ).first()
+    ))
 
     if not topic:
         raise HTTPException(
@@ -32,216 +238,153 @@ async def start_study_session(
             detail="Topic not found"
         )
 
-    flashcards = db.query(Flashcard).filter(
-        Flashcard.topic_id == topic_id
-    ).all()
+    if mode == "due":
+        flashcard_ids = await _due_flashcard_ids(db, current_user.id, topic.id, limit or settings.study_due_limit)
+    else:
+        flashcard_ids = list(await db.scalars(select(Flashcard.id).where(Flashcard.topic_id == topic_id)))
+        random.shuffle(flashcard_ids)
 
-    if not flashcards:
+    if not flashcard_ids:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="No flashcards found for this topic"
+            detail="No flashcards due for this topic" if mode == "due" else "No flashcards found for this topic"
         )
 
-    random.shuffle(flashcards)
-
     session_id = str(uuid.uuid4())
-    active_sessions[session_id] = {
+    session = {
         "user_id" : current_user.id,
         "topic_id" : topic.id,
-        "flashcards" : [fc.id for fc in flashcards],
+        "topic_name" : topic.name,
+        "flashcards" : flashcard_ids,
+        "cards" : {},
         "current_index" : 0,
-        "results" : []
+        "results" : [],
+        "card_shown_at" : time.time()
     }
-
-    first_flashcard = flashcards[0]
+    await _fill_window(db, session, 1 + prefetch)
+    await session_store.save(session_id, session)
+    cards = session["cards"]
 
     return StudySessionResponse(
         session_id=session_id,
         topic_id=topic.id,
         topic_name=topic.name,
-        total_flashcards=len(flashcards),
+        total_flashcards=len(flashcard_ids),
         current_index=1,
-        flashcard={
-            "id" : first_flashcard.id,
-            "question" : first_flashcard.question,
-            "answer" : first_flashcard.answer
-        }
+        flashcard=cards.get(str(flashcard_ids[0])),
+        upcoming=_upcoming(session, cards, prefetch)
     )
 
 @router.post("/answer", response_model=FlashcardAnswerResponse, status_code=status.HTTP_201_CREATED)
 async def submit_answer(
         answer: FlashcardAnswerSubmit,
         current_user: User=Depends(get_current_user),
-        db: Session=Depends(get_db)
+        db: AsyncSession=Depends(get_db)
 ):
-    if answer.session_id not in active_sessions:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Session not found"
-        )
-
-    session = active_sessions[answer.session_id]
-
-    if session["user_id"] != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not your session"
-        )
-
-    flashcard = db.query(Flashcard).filter(
-        Flashcard.id == answer.flashcard_id
-    ).first()
-
-    if not flashcard:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Flashcard not found"
-        )
-
-    session["results"].append({
-        "flashcard_id" : answer.flashcard_id,
-        "is_correct" : answer.is_correct
-    })
-
-    session["current_index"] += 1
-    has_next = session["current_index"] < len(session["flashcards"])
-
-    total_answered = len(session["results"])
-    correct_count = sum(1 for r in session["results"] if r["flashcards"])
-    accuracy = (correct_count / total_answered * 100) if total_answered > 0 else 0
+    session = await _get_user_session(answer.session_id, current_user)
+    answered = await _apply_answers(db, answer.session_id, session, [answer], current_user.id)
 
     return FlashcardAnswerResponse(
         correct=answer.is_correct,
-        correct_answer=flashcard.answer,
-        has_next=has_next,
-        progress={
-            "answered" : total_answered,
-            "correct" : correct_count,
-            "accuracy" : round(accuracy, 2),
-            "remaining" : len(session["flashcards"]) - total_answered
-        }
+        correct_answer=answered[str(answer.flashcard_id)]["answer"],
+        has_next=session["current_index"] < len(session["flashcards"]),
+        progress=_session_progress(session)
+    )
+
+@router.post("/answers", response_model=FlashcardAnswerBatchResponse, status_code=status.HTTP_201_CREATED)
+async def submit_answers(
+        batch: FlashcardAnswerBatch,
+        prefetch: int=Query(0, ge=0, le=settings.study_prefetch_max),
+        current_user: User=Depends(get_current_user),
+        db: AsyncSession=Depends(get_db)
+):
+    session = await _get_user_session(batch.session_id, current_user)
+    answered = await _apply_answers(db, batch.session_id, session, batch.answers, current_user.id, max(1, prefetch))
+
+    # The next card to show is at current_index; prefetching starts with it.
+    upcoming = []
+    if prefetch and session["current_index"] < len(session["flashcards"]):
+        cards = session["cards"]
+        next_id = str(session["flashcards"][session["current_index"]])
+        upcoming = ([cards[next_id]] if next_id in cards else []) + _upcoming(session, cards, prefetch - 1)
+
+    return FlashcardAnswerBatchResponse(
+        results=[
+            {
+                "flashcard_id" : answer.flashcard_id,
+                "correct" : answer.is_correct,
+                "correct_answer" : answered[str(answer.flashcard_id)]["answer"]
+            }
+            for answer in batch.answers
+        ],
+        has_next=session["current_index"] < len(session["flashcards"]),
+        progress=_session_progress(session),
+        upcoming=upcoming
     )
 
 @router.get("/next/{session_id}", response_model=StudySessionResponse)
 async def get_next_flashcard(
-        session_id: int,
+        session_id: str,
+        prefetch: int=Query(0, ge=0, le=settings.study_prefetch_max),
         current_user: User=Depends(get_current_user),
-        db: Session=Depends(get_db)
+        db: AsyncSession=Depends(get_db)
 ):
-    if session_id not in active_sessions:
+    session = await _get_user_session(session_id, current_user)
+
+    if session["current_index"] >= len(session["flashcards"]):
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Session not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Session complete. Get summary"
         )
 
-    session = active_sessions[session_id]
+    await _session_topic_name(db, session)
+    if await _fill_window(db, session, 1 + prefetch):
+        await session_store.save(session_id, session)
+    cards = session["cards"]
+    flashcard = cards.get(str(session["flashcards"][session["current_index"]]))
 
-    if session["user_id"] != current_user.id:
+    if not flashcard:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not your session"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Flashcard not found"
         )
 
-    if session["current_index"] >= len(session["flashcards"]):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Session complete. Get summary"
-            )
-
-    topic = db.query(Topic).filter(
-        Topic.id == session["topic_id"]
-    ).first()
-
-    current_flashcard_id = session["flashcards"][session["current_index"]]
-    flashcard = db.query(Flashcard).filter(
-        Flashcard.id == current_flashcard_id
-    ).first()
-
     return StudySessionResponse(
         session_id=session_id,
-        topic_id=topic.id,
-        topic_name=topic.name,
+        topic_id=session["topic_id"],
+        topic_name=session["topic_name"],
         total_flashcards=len(session["flashcards"]),
         current_index=session["current_index"] + 1,
-        flashcard={
-            "id" : flashcard.id,
-            "question" : flashcard.question,
-            "answer" : flashcard.answer
-        }
+        flashcard=flashcard,
+        upcoming=_upcoming(session, cards, prefetch)
     )
 
 @router.get("/summary/{session_id}", response_model=SessionSummary)
 async def get_session_summary(
-        session_id: int,
+        session_id: str,
         current_user: User=Depends(get_current_user),
-        db: Session=Depends(get_db)
+        db: AsyncSession=Depends(get_db)
 ):
-    if session_id not in active_sessions:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Session not found"
-        )
-
-    session = active_sessions[session_id]
-
-    if session["user_id"] != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not your session"
-        )
-
-    topic = db.query(Topic).filter(
-        Topic.id == session["topic_id"]
-    ).first()
+    session = await _get_user_session(session_id, current_user)
+    await _session_topic_name(db, session)
 
     total_reviewed = len(session["results"])
     correct_count = sum(1 for r in session["results"] if r["is_correct"])
     accuracy = (correct_count / total_reviewed * 100) if total_reviewed > 0 else 0
 
-    progress = db.query(UserProgress).filter(
-        UserProgress.user_id == current_user.id,
-        UserProgress.topic_id == session["topic_id"]
-    ).first()
+    streak_days = await record_session(db, current_user.id, session["topic_id"], total_reviewed, correct_count, utcnow())
 
-    if not progress:
-        progress = UserProgress(
-            user_id=current_user.id,
-            topic_id=session["topic_id"],
-            flashcards_reviewed=0,
-            correct_answers=0,
-            total_answers=0,
-            streak_days=0
-        )
-        db.add(progress)
+    await _record_reviews(db, current_user.id, session["topic_id"], session["results"])
 
-    progress.flashcards_reviewed += total_reviewed
-    progress.correct_answers += correct_count
-    progress.total_answers += total_reviewed
+    await db.commit()
 
-    now = datetime.now(timezone.utc)
-    if progress.last_study_date:
-        last_date = progress.last_study_date.replace(tzinfo=timezone.utc) if progress.last_study_date.tzinfo is None else progress.last_study_date
-        days_diff = (now.date() - last_date.date()).days
-
-        if days_diff == 1:
-            progress.streak_days += 1
-        elif days_diff > 1:
-            progress.streak_days = 1
-    else:
-        progress.streak_days = 1
-
-    progress.last_study_date = now
-
-    db.commit()
-    db.refresh(progress)
-
-    del active_sessions[session_id]
+    await session_store.delete(session_id)
 
     return SessionSummary(
         session_id=session_id,
-        topic_name=topic.name,
+        topic_name=session["topic_name"],
         total_reviewed=total_reviewed,
         correct_count=correct_count,
         accuracy=round(accuracy, 2),
-        streak_days=progress.streak_days,
+        streak_days=streak_days,
     )
\ No newline at end of file
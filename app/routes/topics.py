@@ -1,120 +1,146 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response
-from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
-from ..models import User, Topic
-from ..schemas import TopicCreate, TopicResponse, TopicUpdate
-from ..auth import get_current_user
-
-router = APIRouter(
-    prefix="/topics",
-    tags=["Topics"]
-)
-
-@router.post("", response_model=TopicResponse, status_code=status.HTTP_201_CREATED)
-async def create_topic(
-        topic: TopicCreate,
-        current_user: User=Depends(get_current_user),
-        db: Session=Depends(get_db)
-):
-    db_topic = Topic(
-        name=topic.name,
-        description=topic.description,
-        user_id=current_user.id
-    )
-    db.add(db_topic)
-    db.commit()
-    db.refresh(db_topic)
-
-    return {
-        **db_topic.__dict__,
-        "flashcard_count" : 0,
-    }
-
-@router.get("", response_model=List[TopicResponse])
-async def get_topics(
-        current_user: User=Depends(get_current_user),
-        db: Session=Depends(get_db)
-):
-    topics = db.query(Topic).filter(Topic.user_id == current_user.id).all()
-
-    return [
-        {
-            **topic.__dict__,
-            "flashcard_count" : len(topic.flashcards) if topic.flashcards else 0
-        }
-        for topic in topics
-    ]
-
-@router.get("/{topic_id}", response_model=TopicResponse)
-async def get_topic(
-        topic_id: int,
-        current_user: User=Depends(get_current_user),
-        db: Session=Depends(get_db)
-):
-    topic = db.query(Topic).filter(
-        Topic.id == topic_id,
-        Topic.user_id == current_user.id
-    ).first()
-
-    if not topic:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Topic not found"
-        )
-
-    return {
-        **topic.__dict__,
-        "flashcard_count" : len(topic.flashcards) if topic.flashcards else 0
-    }
-
-@router.patch("/{topic_id}", response_model=TopicResponse)
-async def update_topic(
-        topic_id: int,
-        topic_update: TopicUpdate,
-        current_user: User=Depends(get_current_user),
-        db: Session=Depends(get_db)
-):
-    topic = db.query(Topic).filter(
-        Topic.id == topic_id,
-        Topic.user_id == current_user.id
-    ).first()
-
-    if not topic:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Topic not found"
-        )
-
-    if topic_update.name is not None:
-        topic.name = topic_update.name
-    if topic_update.description is not None:
-        topic.description = topic_update.description
-
-    db.commit()
-    db.refresh(topic)
-
-    return {
-        **topic.__dict__,
-        "flashcard_count" : len(topic.flashcards) if topic.flashcards else 0
-    }
-
-@router.delete("/{topic_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_topic(
-        topic_id: int,
-        current_user: User=Depends(get_current_user),
-        db: Session=Depends(get_db)
-):
-    topic = db.query(Topic).filter(
-        Topic.id == topic_id,
-        Topic.user_id == current_user.id
-    ).first()
-
-    if not topic:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Topic not found"
-        )
-
-    db.delete(topic)
-    db.commit()
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+import orjson
+from ..database import get_db, get_read_db
+from ..models import User, Topic, Flashcard, CardReview, FlashcardSignatureBucket
+from ..schemas import TopicCreate, TopicResponse, TopicUpdate, read_topic
+from ..auth import get_current_user
+from ..progress import remove_topic
+from ..http_cache import bump_topic_version, make_etag, etag_matches, not_modified, cached_response, json_response
+
+router = APIRouter(
+    prefix="/topics",
+    tags=["Topics"]
+)
+
+def _topics_with_counts():
+    return select(Topic, func.count(Flashcard.id)).outerjoin(
+        Flashcard, Flashcard.topic_id == Topic.id
+    ).group_by(Topic.id)
+
+def _topic_payload(topic: Topic, flashcard_count: int) -> dict:
+    # Rows come straight from the mapped model, so the response skips re-validation through TopicResponse.
+    return {**read_topic(topic), "flashcard_count" : flashcard_count}
+
+@router.post("", response_model=TopicResponse, status_code=status.HTTP_201_CREATED)
+async def create_topic(
+        topic: TopicCreate,
+        current_user: User=Depends(get_current_user),
+        db: AsyncSession=Depends(get_db)
+):
+    db_topic = Topic(
+        name=topic.name,
+        description=topic.description,
+        user_id=current_user.id
+    )
+    db.add(db_topic)
+    await db.commit()
+    await db.refresh(db_topic)
+
+    return ORJSONResponse(_topic_payload(db_topic, 0), status_code=status.HTTP_201_CREATED)
+
+@router.get("", response_model=List[TopicResponse])
+async def get_topics(
+        request: Request,
+        current_user: User=Depends(get_current_user),
+        db: AsyncSession=Depends(get_read_db)
+):
+    # Topic versions change with every topic or flashcard write, so they alone decide whether the list changed.
+    versions = await db.execute(
+        select(Topic.id, Topic.version).where(Topic.user_id == current_user.id).order_by(Topic.id)
+    )
+    etag = make_etag("topics", current_user.id, *(f"{id}.{version}" for id, version in versions))
+    if etag_matches(request, etag):
+        return not_modified("topics", etag)
+
+    cached = cached_response("topics", etag)
+    if cached is not None:
+        return cached
+
+    rows = await db.execute(
+        _topics_with_counts().where(Topic.user_id == current_user.id)
+    )
+
+    topics = [_topic_payload(topic, flashcard_count) for topic, flashcard_count in rows]
+    return json_response("topics", etag, orjson.dumps(topics), etag)
+
+@router.get("/{topic_id}", response_model=TopicResponse)
+async def get_topic(
+        topic_id: int,
+        current_user: User=Depends(get_current_user),
+        db: AsyncSession=Depends(get_read_db)
+):
+    row = (await db.execute(_topics_with_counts().where(
+        Topic.id == topic_id,
+        Topic.user_id == current_user.id
+    ))).first()
+
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Topic not found"
+        )
+
+    topic, flashcard_count = row
+    return ORJSONResponse(_topic_payload(topic, flashcard_count))
+
+@router.patch("/{topic_id}", response_model=TopicResponse)
+async def update_topic(
+        topic_id: int,
+        topic_update: TopicUpdate,
+        current_user: User=Depends(get_current_user),
+        db: AsyncSession=Depends(get_db)
+):
+    topic = await db.scalar(select(Topic).where(
+        Topic.id == topic_id,
+        Topic.user_id == current_user.id
+    ))
+
+    if not topic:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Topic not found"
+        )
+
+    if topic_update.name is not None:
+        topic.name = topic_update.name
+    if topic_update.description is not None:
+        topic.description = topic_update.description
+
+    await db.execute(bump_topic_version(topic.id))
+    await db.commit()
+    await db.refresh(topic)
+
+    flashcard_count = await db.scalar(
+        select(func.count(Flashcard.id)).where(Flashcard.topic_id == topic.id)
+    )
+
+    return ORJSONResponse(_topic_payload(topic, flashcard_count))
+
+@router.delete("/{topic_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_topic(
+        topic_id: int,
+        current_user: User=Depends(get_current_user),
+        db: AsyncSession=Depends(get_db)
+):
+    topic = await db.scalar(select(Topic).where(
+        Topic.id == topic_id,
+        Topic.user_id == current_user.id
+    ))
+
+    if not topic:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Topic not found"
+        )
+
+    await remove_topic(db, current_user.id, topic.id)
+
+    # One statement per table instead of a cascade that loads each card's rows; SQLite does not enforce the FK cascades.
+    await db.execute(delete(CardReview).where(CardReview.topic_id == topic.id))
+    await db.execute(delete(FlashcardSignatureBucket).where(FlashcardSignatureBucket.topic_id == topic.id))
+    await db.delete(topic)
+    await db.commit()
@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from .models import CardReview
+
+MIN_EASE_FACTOR = 1.3
+CORRECT_QUALITY = 4
+INCORRECT_QUALITY = 1
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def answer_quality(is_correct: bool, quality: Optional[int]=None) -> int:
+    if quality is not None:
+        return quality
+    return CORRECT_QUALITY if is_correct else INCORRECT_QUALITY
+
+def apply_review(review: CardReview, quality: int, now: datetime) -> CardReview:
+    """Advance a card's SM-2 state after an answer graded 0 (blackout) to 5 (perfect)."""
+    repetitions = review.repetitions or 0
+    interval = review.interval_days or 0.0
+    ease_factor = review.ease_factor or 2.5
+
+    if quality >= 3:
+        if repetitions == 0:
+            interval = 1.0
+        elif repetitions == 1:
+            interval = 6.0
+        else:
+            interval = round(interval * ease_factor, 2)
+        repetitions += 1
+    else:
+        repetitions = 0
+        interval = 1.0
+        review.lapses = (review.lapses or 0) + 1
+
+    ease_factor += 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+
+    review.repetitions = repetitions
+    review.interval_days = interval
+    review.ease_factor = max(MIN_EASE_FACTOR, ease_factor)
+    review.last_reviewed_at = now
+    review.due_at = now + timedelta(days=interval)
+    return review
@@ -1,122 +1,190 @@
-from pydantic import BaseModel, EmailStr
-from datetime import datetime
-from typing import Optional, List
-
-class UserCreate(BaseModel):
-    email: EmailStr
-    username: str
-    password: str
-
-class UserLogin(BaseModel):
-    username: str
-    password: str
-
-class UserResponse(BaseModel):
-    id: int
-    username: str
-    email: str
-
-    class Config:
-        from_attributes = True
-
-class Token(BaseModel):
-    access_token: str
-    token_type: str
-
-class TopicCreate(BaseModel):
-    name: str
-    description: Optional[str]=None
-
-class TopicUpdate(BaseModel):
-    name: Optional[str]=None
-    description: Optional[str]=None
-
-class TopicResponse(BaseModel):
-    id: int
-    name: str
-    description: Optional[str]
-    created_at: datetime
-    flashcard_count: int=0
-
-    class Config:
-        from_attributes = True
-
-class FlashcardCreate(BaseModel):
-    question: str
-    answer: str
-    difficulty: Optional[str]="medium"
-
-class FlashcardUpdate(BaseModel):
-    question: Optional[str]=None
-    answer: Optional[str]=None
-    difficulty: Optional[str]=None
-
-class FlashcardResponse(BaseModel):
-    id: int
-    question: str
-    answer: str
-    difficulty: str
-    created_at: datetime
-
-    class Config:
-        from_attributes = True
-
-class AIFlashcardRequest(BaseModel):
-    topic_name: str
-    count: int=5
-    difficulty: Optional[str]="medium"
-
-class ProgressResponse(BaseModel):
-    topic_id: int
-    topic_name: str
-    flashcards_reviewed: int
-    accuracy: float
-    streak_days: int
-    last_study_date: Optional[datetime]
-
-    class Config:
-        from_attributes = True
-
-class StudySessionResponse(BaseModel):
-    session_id: str
-    topic_id: int
-    topic_name: str
-    total_flashcards: int
-    current_index: int
-    flashcard: Optional[dict]=None
-
-    class Config:
-        from_attributes = True
-
-class FlashcardAnswerSubmit(BaseModel):
-    session_id: str
-    flashcard_id: int
-    is_correct: bool
-
-class FlashcardAnswerResponse(BaseModel):
-    correct: bool
-    correct_answer: str
-    has_next: bool
-    progress: dict
-
-    class Config:
-        from_attributes = True
-
-class SessionSummary(BaseModel):
-    session_id: str
-    topic_name: str
-    total_reviewed: int
-    correct_count: int
-    accuracy: float
-    streak_days: int
-
-class OverallProgressResponse(BaseModel):
-    total_topics: int
-    total_flashcards_reviewed: int
-    overall_accuracy: float
-    current_streak: int
-    longest_streak: int
-    topics: List[ProgressResponse]
-
-    class Config:
-        from_attributes = True
+from pydantic import BaseModel, EmailStr, Field, StringConstraints
+from datetime import datetime
+from operator import attrgetter
+from typing import Annotated, Callable, Optional, List, Type
+from .settings import settings
+
+class UserCreate(BaseModel):
+    email: EmailStr
+    username: str
+    password: str
+
+class UserLogin(BaseModel):
+    username: str
+    password: str
+
+class UserResponse(BaseModel):
+    id: int
+    username: str
+    email: str
+
+    class Config:
+        from_attributes = True
+
+class Token(BaseModel):
+    access_token: str
+    token_type: str
+
+class TopicCreate(BaseModel):
+    name: str
+    description: Optional[str]=None
+
+class TopicUpdate(BaseModel):
+    name: Optional[str]=None
+    description: Optional[str]=None
+
+class TopicResponse(BaseModel):
+    id: int
+    name: str
+    description: Optional[str]
+    created_at: datetime
+    flashcard_count: int=0
+
+    class Config:
+        from_attributes = True
+
+# Stripped before the length check, so whitespace-only text is rejected as well as empty text.
+CardText = Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
+
+class FlashcardCreate(BaseModel):
+    question: CardText
+    answer: CardText
+    difficulty: Optional[str]="medium"
+
+class FlashcardUpdate(BaseModel):
+    question: Optional[CardText]=None
+    answer: Optional[CardText]=None
+    difficulty: Optional[str]=None
+
+class FlashcardResponse(BaseModel):
+    id: int
+    question: str
+    answer: str
+    difficulty: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class FlashcardSearchResult(FlashcardResponse):
+    topic_id: int
+    rank: float
+
+class FlashcardImportError(BaseModel):
+    row: int
+    error: str
+
+class FlashcardImportResult(BaseModel):
+    imported: int
+    duplicates: int
+    failed: int
+    errors: List[FlashcardImportError]
+
+class AIFlashcardRequest(BaseModel):
+    topic_name: str
+    # Each batch of ai_chunk_size cards is a paid API call, so the fan-out is bounded here.
+    count: int=Field(5, ge=1, le=settings.ai_max_cards_per_request)
+    difficulty: Optional[str]="medium"
+
+class GenerationJobResponse(BaseModel):
+    id: str
+    topic_id: int
+    status: str
+    flashcard_ids: Optional[List[int]]=None
+    error: Optional[str]=None
+    created_at: datetime
+    updated_at: Optional[datetime]=None
+
+    class Config:
+        from_attributes = True
+
+class ProgressResponse(BaseModel):
+    topic_id: int
+    topic_name: str
+    flashcards_reviewed: int
+    accuracy: float
+    streak_days: int
+    last_study_date: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+class StudySessionResponse(BaseModel):
+    session_id: str
+    topic_id: int
+    topic_name: str
+    total_flashcards: int
+    current_index: int
+    flashcard: Optional[dict]=None
+    upcoming: List[dict]=[]
+
+    class Config:
+        from_attributes = True
+
+class FlashcardAnswerItem(BaseModel):
+    flashcard_id: int
+    is_correct: bool
+    quality: Optional[int]=Field(None, ge=0, le=5)
+    latency_ms: Optional[int]=Field(None, ge=0)
+
+class FlashcardAnswerSubmit(FlashcardAnswerItem):
+    session_id: str
+
+class FlashcardAnswerBatch(BaseModel):
+    session_id: str
+    answers: List[FlashcardAnswerItem]=Field(..., min_length=1)
+
+class FlashcardAnswerResponse(BaseModel):
+    correct: bool
+    correct_answer: str
+    has_next: bool
+    progress: dict
+
+    class Config:
+        from_attributes = True
+
+class FlashcardAnswerResult(BaseModel):
+    flashcard_id: int
+    correct: bool
+    correct_answer: str
+
+class FlashcardAnswerBatchResponse(BaseModel):
+    results: List[FlashcardAnswerResult]
+    has_next: bool
+    progress: dict
+    upcoming: List[dict]=[]
+
+class SessionSummary(BaseModel):
+    session_id: str
+    topic_name: str
+    total_reviewed: int
+    correct_count: int
+    accuracy: float
+    streak_days: int
+
+class OverallProgressResponse(BaseModel):
+    total_topics: int
+    total_flashcards_reviewed: int
+    overall_accuracy: float
+    current_streak: int
+    longest_streak: int
+    topics: List[ProgressResponse]
+
+    class Config:
+        from_attributes = True
+
+def attribute_reader(model: Type[BaseModel], exclude: tuple=()) -> Callable[[object], dict]:
+    """Build a function that copies ``model``'s fields off a trusted ORM object without validating them.
+
+    Hot read paths use it with ORJSONResponse; the output matches ``model`` as long as the columns
+    already have the declared types, which holds for rows loaded through the mapped models.
+    """
+    fields = tuple(name for name in model.model_fields if name not in exclude)
+    if len(fields) == 1:
+        return lambda obj: {fields[0] : getattr(obj, fields[0])}
+
+    getter = attrgetter(*fields)
+    return lambda obj: dict(zip(fields, getter(obj)))
+
+read_flashcard = attribute_reader(FlashcardResponse)
+read_topic = attribute_reader(TopicResponse, exclude=("flashcard_count",))
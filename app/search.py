@@ -0,0 +1,129 @@
+import re
+from typing import List, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# The index is maintained by the database itself (a generated column on PostgreSQL, triggers on
+# SQLite), so every write path - single edits, AI generation, bulk import - stays in sync.
+POSTGRES_DDL = [
+    """
+    ALTER TABLE flashcards ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(question, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(answer, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_flashcards_search_vector ON flashcards USING GIN (search_vector)",
+]
+
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS flashcards_fts USING fts5(
+        question, answer, content='flashcards', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS flashcards_fts_insert AFTER INSERT ON flashcards BEGIN
+        INSERT INTO flashcards_fts(rowid, question, answer) VALUES (new.id, new.question, new.answer);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS flashcards_fts_delete AFTER DELETE ON flashcards BEGIN
+        INSERT INTO flashcards_fts(flashcards_fts, rowid, question, answer) VALUES ('delete', old.id, old.question, old.answer);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS flashcards_fts_update AFTER UPDATE OF question, answer ON flashcards BEGIN
+        INSERT INTO flashcards_fts(flashcards_fts, rowid, question, answer) VALUES ('delete', old.id, old.question, old.answer);
+        INSERT INTO flashcards_fts(rowid, question, answer) VALUES (new.id, new.question, new.answer);
+    END
+    """,
+]
+
+POSTGRES_QUERY = """
+    SELECT f.id, f.topic_id, f.question, f.answer, f.difficulty, f.created_at,
+           ts_rank(f.search_vector, query) AS rank
+    FROM flashcards f
+    JOIN topics t ON t.id = f.topic_id,
+         to_tsquery('english', :query) query
+    WHERE f.search_vector @@ query
+      AND t.user_id = :user_id
+      {topic_filter}
+    ORDER BY rank DESC, f.id
+    LIMIT :limit OFFSET :offset
+"""
+
+SQLITE_QUERY = """
+    SELECT f.id, f.topic_id, f.question, f.answer, f.difficulty, f.created_at,
+           -bm25(flashcards_fts, 2.0, 1.0) AS rank
+    FROM flashcards_fts
+    JOIN flashcards f ON f.id = flashcards_fts.rowid
+    JOIN topics t ON t.id = f.topic_id
+    WHERE flashcards_fts MATCH :query
+      AND t.user_id = :user_id
+      {topic_filter}
+    ORDER BY rank DESC, f.id
+    LIMIT :limit OFFSET :offset
+"""
+
+class SearchNotSupported(Exception):
+    pass
+
+def install_search_index(bind: Engine) -> None:
+    with bind.begin() as conn:
+        _install(conn)
+
+def _install(conn: Connection) -> None:
+    if conn.dialect.name == "postgresql":
+        for statement in POSTGRES_DDL:
+            conn.execute(text(statement))
+    elif conn.dialect.name == "sqlite":
+        created = not conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'flashcards_fts'")).first()
+        for statement in SQLITE_DDL:
+            conn.execute(text(statement))
+        if created:
+            conn.execute(text("INSERT INTO flashcards_fts(flashcards_fts) VALUES ('rebuild')"))
+
+def search_terms(query: str) -> List[str]:
+    return re.findall(r"\w+", query.lower())
+
+def _match_expression(dialect: str, terms: List[str]) -> str:
+    # Every term must match; the last one may be a prefix so results update while typing.
+    if dialect == "postgresql":
+        return " & ".join(terms[:-1] + [terms[-1] + ":*"])
+    return " ".join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+
+async def search_flashcards(
+        db: AsyncSession,
+        user_id: int,
+        query: str,
+        limit: int,
+        offset: int,
+        topic_id: Optional[int]=None
+) -> List[dict]:
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        statement = POSTGRES_QUERY
+    elif dialect == "sqlite":
+        statement = SQLITE_QUERY
+    else:
+        raise SearchNotSupported(dialect)
+
+    params = {
+        "query" : _match_expression(dialect, terms),
+        "user_id" : user_id,
+        "limit" : limit,
+        "offset" : offset,
+    }
+    topic_filter = ""
+    if topic_id is not None:
+        topic_filter = "AND f.topic_id = :topic_id"
+        params["topic_id"] = topic_id
+
+    result = await db.execute(text(statement.format(topic_filter=topic_filter)), params)
+    return [dict(row) for row in result.mappings()]
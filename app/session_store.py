@@ -0,0 +1,135 @@
+import json
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import delete, func, select
+from .cache import TTLCache
+from .database import AsyncSessionLocal, SessionLocal
+from .models import StudySession
+from .settings import settings
+from . import metrics
+
+sessions_live = metrics.Gauge(
+    "study_sessions_live",
+    "Study sessions currently held by the session store"
+)
+sessions_evicted = metrics.Counter(
+    "study_sessions_evicted_total",
+    "Study sessions evicted from the session store",
+    ["reason"]
+)
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class SessionStore(ABC):
+    @abstractmethod
+    async def get(self, session_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def save(self, session_id: str, data: dict) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, session_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+class MemorySessionStore(SessionStore):
+    """Process-local store. Only safe with a single worker process."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self._sessions = TTLCache(
+            maxsize=max_entries,
+            ttl=ttl_seconds,
+            on_evict=lambda key, reason: sessions_evicted.inc(reason=reason)
+        )
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        return self._sessions.get(session_id)
+
+    async def save(self, session_id: str, data: dict) -> None:
+        self._sessions.set(session_id, data)
+
+    async def delete(self, session_id: str) -> None:
+        self._sessions.pop(session_id)
+
+    def count(self) -> int:
+        self._sessions.purge_expired()
+        return len(self._sessions)
+
+class DatabaseSessionStore(SessionStore):
+    """Keeps session state in the study_sessions table so every worker sees the same sessions."""
+
+    def __init__(
+            self,
+            ttl_seconds: int,
+            purge_interval_seconds: int,
+            session_factory=AsyncSessionLocal,
+            sync_session_factory=SessionLocal
+    ):
+        self._ttl = timedelta(seconds=ttl_seconds)
+        self._purge_interval = purge_interval_seconds
+        self._session_factory = session_factory
+        self._sync_session_factory = sync_session_factory
+        self._last_purge = 0.0
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        async with self._session_factory() as db:
+            data = await db.scalar(select(StudySession.data).where(
+                StudySession.id == session_id,
+                StudySession.expires_at > _utcnow()
+            ))
+
+        return json.loads(data) if data else None
+
+    async def save(self, session_id: str, data: dict) -> None:
+        async with self._session_factory() as db:
+            await db.merge(StudySession(
+                id=session_id,
+                user_id=data["user_id"],
+                data=json.dumps(data),
+                expires_at=_utcnow() + self._ttl
+            ))
+            await db.commit()
+
+        if time.monotonic() - self._last_purge >= self._purge_interval:
+            await self.purge_expired()
+
+    async def delete(self, session_id: str) -> None:
+        async with self._session_factory() as db:
+            await db.execute(delete(StudySession).where(StudySession.id == session_id))
+            await db.commit()
+
+    def count(self) -> int:
+        # Called from the synchronous /metrics handler, which runs in the threadpool.
+        with self._sync_session_factory() as db:
+            return db.query(func.count(StudySession.id)).filter(
+                StudySession.expires_at > _utcnow()
+            ).scalar()
+
+    async def purge_expired(self) -> int:
+        self._last_purge = time.monotonic()
+        async with self._session_factory() as db:
+            result = await db.execute(delete(StudySession).where(StudySession.expires_at <= _utcnow()))
+            await db.commit()
+
+        if result.rowcount:
+            sessions_evicted.inc(result.rowcount, reason="expired")
+        return result.rowcount
+
+def create_session_store() -> SessionStore:
+    if settings.session_store_backend == "memory":
+        return MemorySessionStore(settings.session_max_entries, settings.session_ttl_seconds)
+    if settings.session_store_backend == "database":
+        return DatabaseSessionStore(settings.session_ttl_seconds, settings.session_purge_interval_seconds)
+
+    raise ValueError(f"Unknown session store backend: {settings.session_store_backend}")
+
+session_store = create_session_store()
+sessions_live.set_function(session_store.count)
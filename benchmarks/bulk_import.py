@@ -0,0 +1,74 @@
+"""Cards per second imported through POST /topics/{id}/flashcards/import.
+
+Builds one CSV upload of --cards rows and imports it into a fresh topic once
+per batch size, reporting throughput for each:
+
+    python -m benchmarks.bulk_import --cards 20000 --batch-sizes 100 500 1000 5000
+
+--keep-duplicates imports with skip_duplicates=false, which still indexes every
+card's signature but skips the similarity checks, isolating the insert path.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+
+from .common import configure_database, asgi_client, register_user, create_topic, dispose_engines, QueryCounter
+
+def build_csv(count: int) -> bytes:
+    # Hashed item names keep the questions far apart, so duplicate detection does not drop any.
+    lines = ["question,answer,difficulty"]
+    lines.extend(
+        f'"What is item {hashlib.sha1(str(i).encode()).hexdigest()[:12]}?","Item {i}",medium'
+        for i in range(count)
+    )
+    return ("\n".join(lines) + "\n").encode()
+
+async def run(args) -> list:
+    from app.main import app
+
+    upload = build_csv(args.cards)
+    results = []
+    async with asgi_client(app) as client:
+        headers = await register_user(client)
+        for batch_size in args.batch_sizes:
+            topic_id = await create_topic(client, headers, name=f"Import batch {batch_size}")
+
+            with QueryCounter() as queries:
+                start = time.perf_counter()
+                response = await client.post(
+                    f"/topics/{topic_id}/flashcards/import",
+                    params={"format" : "csv", "batch_size" : batch_size, "skip_duplicates" : not args.keep_duplicates},
+                    files={"file" : ("cards.csv", upload, "text/csv")},
+                    headers=headers,
+                    timeout=None
+                )
+                elapsed = time.perf_counter() - start
+            response.raise_for_status()
+
+            imported = response.json()["imported"]
+            results.append({
+                "batch_size" : batch_size,
+                "imported" : imported,
+                "statements" : queries.count,
+                "seconds" : round(elapsed, 3),
+                "cards_per_second" : round(imported / elapsed, 1),
+            })
+
+    await dispose_engines()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=20000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 500, 1000, 5000])
+    parser.add_argument("--keep-duplicates", action="store_true", help="skip the near-duplicate checks")
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    configure_database(args.database_url)
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Helpers shared by the benchmark scripts.
+
+The scripts import the application, so the database has to be configured
+before anything from ``app`` is imported. Run them from the repository root,
+for example ``python -m benchmarks.concurrency``.
+"""
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from typing import Dict, List, Sequence
+
+def configure_database(url: str=None) -> str:
+    if url is None:
+        fd, path = tempfile.mkstemp(prefix="flashcards-bench-", suffix=".db")
+        os.close(fd)
+        url = f"sqlite:///{path}"
+    os.environ["DATABASE_URL"] = url
+    return url
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize(samples: Sequence[float], elapsed: float=None) -> Dict[str, float]:
+    summary = {
+        "count" : len(samples),
+        "mean_ms" : round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+        "p50_ms" : round(percentile(samples, 50) * 1000, 3),
+        "p95_ms" : round(percentile(samples, 95) * 1000, 3),
+        "p99_ms" : round(percentile(samples, 99) * 1000, 3),
+        "max_ms" : round(max(samples) * 1000, 3) if samples else 0.0,
+    }
+    if elapsed:
+        summary["throughput_rps"] = round(len(samples) / elapsed, 1)
+    return summary
+
+def asgi_client(app):
+    import httpx
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+async def register_user(client, username: str=None) -> Dict[str, str]:
+    username = username or f"bench-{uuid.uuid4().hex[:12]}"
+    response = await client.post("/auth/register", json={
+        "email" : f"{username}@example.com",
+        "username" : username,
+        "password" : "benchmark-password"
+    })
+    response.raise_for_status()
+    return {"Authorization" : f"Bearer {response.json()['access_token']}"}
+
+async def create_topic(client, headers: Dict[str, str], name: str="Benchmark topic") -> int:
+    response = await client.post("/topics", json={"name" : name}, headers=headers)
+    response.raise_for_status()
+    return response.json()["id"]
+
+def seed_flashcards(topic_id: int, count: int, batch_size: int=5000) -> None:
+    """Insert cards straight through the sync engine; seeding through the API would dominate run time."""
+    from sqlalchemy import insert
+    from app.database import engine
+    from app.models import Flashcard
+
+    with engine.begin() as conn:
+        for start in range(0, count, batch_size):
+            conn.execute(insert(Flashcard), [
+                {
+                    "topic_id" : topic_id,
+                    "question" : f"Benchmark question {i}?",
+                    "answer" : f"Answer {i}",
+                    "difficulty" : "medium",
+                }
+                for i in range(start, min(count, start + batch_size))
+            ])
+
+async def timed_requests(client, requests: List[tuple], concurrency: int) -> tuple:
+    """Issue (method, url, kwargs) requests with at most ``concurrency`` in flight; returns latencies and wall time."""
+    import asyncio
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def issue(method, url, kwargs):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(issue(*request) for request in requests))
+    return latencies, time.perf_counter() - started
+
+async def dispose_engines() -> None:
+    from app.database import dispose_engines as dispose
+
+    await dispose()
+
+class QueryCounter:
+    """Counts statements sent through the application's engines while active."""
+
+    def __init__(self):
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def _engines(self):
+        from app import database
+
+        engines = [database.engine]
+        if getattr(database, "async_engine", None) is not None:
+            engines.append(database.async_engine.sync_engine)
+        return engines
+
+    def __enter__(self):
+        from sqlalchemy import event
+
+        for engine in self._engines():
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc_info):
+        from sqlalchemy import event
+
+        for engine in self._engines():
+            event.remove(engine, "before_cursor_execute", self._on_execute)
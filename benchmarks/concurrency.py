@@ -0,0 +1,82 @@
+"""Latency of read endpoints under parallel load.
+
+Every request runs in one event loop, like a single uvicorn worker. A fixed
+per-statement delay stands in for network and Postgres time: with a blocking
+driver it stalls the loop, with an async driver it only delays the request
+that issued it. Run it on two revisions to compare p99 latency, e.g.
+
+    python -m benchmarks.concurrency --requests 400 --concurrency 10 --db-latency-ms 5
+
+Keep --concurrency at or below the pool limit (DB_POOL_SIZE + DB_MAX_OVERFLOW,
+20 by default) when measuring a blocking build: it checks connections out on
+the event loop thread, so an exhausted pool stalls the whole loop until
+pool_timeout expires.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from .common import (
+    configure_database, summarize, asgi_client, register_user, create_topic, seed_flashcards, timed_requests, dispose_engines
+)
+
+def install_statement_delay(delay: float) -> None:
+    from sqlalchemy import event
+    from sqlalchemy.util import await_only
+    from app import database
+
+    def trace(statement):
+        time.sleep(delay)
+
+    @event.listens_for(database.engine, "connect")
+    def delay_sync(dbapi_connection, connection_record):
+        dbapi_connection.set_trace_callback(trace)
+
+    async_engine = getattr(database, "async_engine", None)
+    if async_engine is not None:
+        @event.listens_for(async_engine.sync_engine, "connect")
+        def delay_async(dbapi_connection, connection_record):
+            # aiosqlite owns the sqlite3 connection on its worker thread, so install the hook there.
+            driver = dbapi_connection.driver_connection
+            await_only(driver._execute(driver._conn.set_trace_callback, trace))
+
+async def run(args) -> dict:
+    from app.main import app
+
+    async with asgi_client(app) as client:
+        headers = await register_user(client)
+        topic_id = await create_topic(client, headers)
+        seed_flashcards(topic_id, args.cards)
+
+        if args.db_latency_ms:
+            install_statement_delay(args.db_latency_ms / 1000)
+
+        endpoints = ["/auth/me", "/topics", f"/topics/{topic_id}", f"/topics/{topic_id}/flashcards"]
+        requests = [("GET", endpoints[i % len(endpoints)], {"headers" : headers}) for i in range(args.requests)]
+        latencies, elapsed = await timed_requests(client, requests, args.concurrency)
+
+    await dispose_engines()
+
+    return {
+        "requests" : args.requests,
+        "concurrency" : args.concurrency,
+        "db_latency_ms" : args.db_latency_ms,
+        "cards" : args.cards,
+        **summarize(latencies, elapsed),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--cards", type=int, default=50)
+    parser.add_argument("--db-latency-ms", type=float, default=5.0)
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    configure_database(args.database_url)
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
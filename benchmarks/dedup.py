@@ -0,0 +1,116 @@
+"""Throughput of near-duplicate detection on large decks.
+
+Indexes a synthetic deck of --deck-size cards in one topic, then checks
+--new-cards incoming cards against it, a --duplicate-ratio share of which are
+light rewrites of existing questions:
+
+    python -m benchmarks.dedup --deck-size 100000 --new-cards 5000
+
+Reports indexing and checking rates, plus how many of the planted duplicates
+were caught and how many distinct cards were wrongly rejected.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from .common import configure_database, dispose_engines
+
+WORDS = (
+    "atom cell river empire theorem enzyme planet sonnet market protein voltage glacier "
+    "treaty orbit genome canyon verb matrix dynasty climate reactor fossil harmony vector "
+    "tariff neuron comet ballad prism delta magma ritual lattice saga quota axiom"
+).split()
+
+TEMPLATES = (
+    "What is the role of the {0} in {1} {2}?",
+    "How does {0} affect the {1} of a {2}?",
+    "Define {0} {1} in the context of {2}.",
+    "Which {0} is linked to the {1} {2}?",
+)
+
+def make_question(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) + str(rng.randrange(1000)) for _ in range(3)]
+    return rng.choice(TEMPLATES).format(*words)
+
+def rewrite(question: str, rng: random.Random) -> str:
+    variants = (
+        question.replace("What is", "What's"),
+        question.lower(),
+        question.rstrip("?.") + " ?",
+        question.replace(" the ", " a ", 1),
+    )
+    return rng.choice(variants)
+
+async def run(args) -> dict:
+    from app.database import AsyncSessionLocal, Base, engine, insert_returning_ids
+    from app.dedup import DuplicateFilter
+    from app.models import Flashcard, Topic, User
+
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(args.seed)
+    deck = [make_question(rng) for _ in range(args.deck_size)]
+
+    async with AsyncSessionLocal() as db:
+        user = User(email="dedup@example.com", username="dedup-bench", hashed_password="x")
+        db.add(user)
+        await db.flush()
+        topic = Topic(name="Dedup benchmark", user_id=user.id)
+        db.add(topic)
+        await db.commit()
+
+        start = time.perf_counter()
+        indexer = DuplicateFilter(db, topic.id, source="benchmark", reject=False)
+        for offset in range(0, len(deck), args.batch_size):
+            rows = await indexer.filter([
+                {"topic_id" : topic.id, "question" : question, "answer" : "-"}
+                for question in deck[offset:offset + args.batch_size]
+            ])
+            ids = await insert_returning_ids(db, Flashcard, rows)
+            await indexer.index(ids)
+            await db.commit()
+        index_seconds = time.perf_counter() - start
+
+        duplicates = round(args.new_cards * args.duplicate_ratio)
+        incoming = [(rewrite(rng.choice(deck), rng), True) for _ in range(duplicates)]
+        incoming += [(make_question(rng), False) for _ in range(args.new_cards - duplicates)]
+        rng.shuffle(incoming)
+
+        start = time.perf_counter()
+        checker = DuplicateFilter(db, topic.id, source="benchmark")
+        kept = []
+        for offset in range(0, len(incoming), args.batch_size):
+            chunk = incoming[offset:offset + args.batch_size]
+            kept.extend(await checker.filter([{"question" : question, "planted" : planted} for question, planted in chunk]))
+        check_seconds = time.perf_counter() - start
+
+    await dispose_engines()
+
+    missed = sum(1 for card in kept if card["planted"])
+    false_rejects = (args.new_cards - duplicates) - sum(1 for card in kept if not card["planted"])
+    return {
+        "deck_size" : args.deck_size,
+        "index_cards_per_second" : round(args.deck_size / index_seconds, 1),
+        "new_cards" : args.new_cards,
+        "check_cards_per_second" : round(args.new_cards / check_seconds, 1),
+        "planted_duplicates" : duplicates,
+        "duplicates_caught" : duplicates - missed,
+        "false_rejects" : false_rejects,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--deck-size", type=int, default=50000)
+    parser.add_argument("--new-cards", type=int, default=5000)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.3)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    configure_database(args.database_url)
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
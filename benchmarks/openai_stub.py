@@ -0,0 +1,59 @@
+"""Minimal stand-in for the OpenAI chat completions API.
+
+Serves deterministic flashcards so the generation pipeline can be exercised
+without network access or cost:
+
+    uvicorn benchmarks.openai_stub:app --port 9999
+    OPENAI_BASE_URL=http://127.0.0.1:9999/v1 OPENAI_API_KEY=stub uvicorn app.main:app
+
+STUB_LATENCY_MS adds a fixed delay per call and STUB_FAILURE_RATE makes that
+fraction of calls fail with a 500 so retries can be observed.
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="OpenAI stub")
+app.state.calls = 0
+
+def completion(content: str, model: str) -> dict:
+    return {
+        "id" : f"chatcmpl-{uuid.uuid4().hex}",
+        "object" : "chat.completion",
+        "created" : int(time.time()),
+        "model" : model,
+        "choices" : [{
+            "index" : 0,
+            "message" : {"role" : "assistant", "content" : content},
+            "finish_reason" : "stop"
+        }],
+        "usage" : {"prompt_tokens" : 0, "completion_tokens" : 0, "total_tokens" : 0}
+    }
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    app.state.calls += 1
+    body = await request.json()
+    prompt = body["messages"][-1]["content"]
+
+    await asyncio.sleep(float(os.getenv("STUB_LATENCY_MS", "0")) / 1000)
+    if random.random() < float(os.getenv("STUB_FAILURE_RATE", "0")):
+        return JSONResponse({"error" : {"message" : "stub failure", "type" : "server_error"}}, status_code=500)
+
+    match = re.search(r"Generate (\d+) flashcards about (.+?) \(", prompt)
+    count, topic = (int(match.group(1)), match.group(2)) if match else (5, "anything")
+    batch = re.search(r"batch (\d+) of", prompt)
+    prefix = f"{batch.group(1)}." if batch else ""
+
+    cards = [
+        {"question" : f"What is fact #{prefix}{i + 1} about {topic}?", "answer" : f"Fact {prefix}{i + 1}"}
+        for i in range(count)
+    ]
+    return completion(json.dumps({"flashcards" : cards}), body.get("model", "stub"))
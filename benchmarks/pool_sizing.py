@@ -0,0 +1,171 @@
+"""Connection pool sizing for N uvicorn workers.
+
+Starts --workers processes, each importing the application with its own
+connection pool like a uvicorn worker would, and drives --concurrency
+requests per worker against the read endpoints of one shared database. The
+run is repeated for every size in --pool-sizes and reports request latency,
+mean checkout wait and checkout timeouts per size, e.g.
+
+    python -m benchmarks.pool_sizing --workers 4 --concurrency 16 --pool-sizes 2,4,8,16
+
+Every worker holds up to DB_POOL_SIZE + DB_MAX_OVERFLOW + DB_SYNC_POOL_SIZE
+connections, so the whole deployment needs
+
+    workers * (pool_size + max_overflow + sync_pool_size) <= max_connections - reserved
+
+on the server (Postgres' max_connections, minus what migrations, admin
+sessions and replicas keep for themselves). The recommendation at the end is
+the smallest pool size whose checkout wait stays under --max-wait-ms with no
+timeouts, checked against that budget. Size the pool for the concurrency a
+worker really sees: connections beyond that only add idle load to the server.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+
+from .common import configure_database, summarize, asgi_client, register_user, create_topic, seed_flashcards, dispose_engines
+
+def worker(args, pool_size: int, headers: dict, topic_id: int, results) -> None:
+    os.environ["DB_POOL_SIZE"] = str(pool_size)
+    os.environ["DB_MAX_OVERFLOW"] = str(args.max_overflow)
+    os.environ["DB_POOL_TIMEOUT_SECONDS"] = str(args.pool_timeout)
+    os.environ["AUTO_CREATE_SCHEMA"] = "false"
+    results.put(asyncio.run(drive(args, headers, topic_id)))
+
+async def drive(args, headers: dict, topic_id: int) -> dict:
+    from app import database
+    from app.main import app
+    from .concurrency import install_statement_delay
+
+    if args.db_latency_ms:
+        install_statement_delay(args.db_latency_ms / 1000)
+
+    endpoints = ["/auth/me", "/topics", f"/topics/{topic_id}", f"/topics/{topic_id}/flashcards?limit=50"]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    errors = 0
+
+    async def issue(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.get(endpoints[i % len(endpoints)], headers=headers)
+                response.raise_for_status()
+            except Exception:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    async with asgi_client(app) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(issue(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+    wait_total, checkouts = database.pool_checkout_seconds.totals(pool="primary")
+    timeouts = database.pool_checkout_timeouts.value(pool="primary")
+    await dispose_engines()
+
+    return {
+        "latencies" : latencies,
+        "elapsed" : elapsed,
+        "errors" : errors,
+        "checkouts" : checkouts,
+        "wait_total" : wait_total,
+        "timeouts" : timeouts,
+    }
+
+def run_size(args, pool_size: int, headers: dict, topic_id: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(args, pool_size, headers, topic_id, results))
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies = [latency for outcome in outcomes for latency in outcome["latencies"]]
+    checkouts = sum(outcome["checkouts"] for outcome in outcomes)
+    wait_total = sum(outcome["wait_total"] for outcome in outcomes)
+    summary = summarize(latencies, max(outcome["elapsed"] for outcome in outcomes))
+
+    return {
+        "pool_size" : pool_size,
+        "connections" : args.workers * (pool_size + args.max_overflow + args.sync_pool_size),
+        "errors" : sum(outcome["errors"] for outcome in outcomes),
+        "checkout_timeouts" : int(sum(outcome["timeouts"] for outcome in outcomes)),
+        "mean_checkout_wait_ms" : round(wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+        **summary,
+    }
+
+def recommend(args, runs: list) -> dict:
+    budget = (args.max_connections - args.reserved) // args.workers - args.max_overflow - args.sync_pool_size
+    healthy = [
+        run for run in runs
+        if not run["checkout_timeouts"] and not run["errors"] and run["mean_checkout_wait_ms"] <= args.max_wait_ms
+    ]
+    pool_size = min((run["pool_size"] for run in healthy), default=None)
+
+    if pool_size is None:
+        advice = "no tested size kept checkout wait under the limit; raise --pool-sizes or add workers/replicas"
+    elif pool_size > budget:
+        advice = f"pool_size {pool_size} exceeds the per-worker budget of {budget}; put PgBouncer in front or lower the worker count"
+    else:
+        advice = f"DB_POOL_SIZE={pool_size} DB_MAX_OVERFLOW={args.max_overflow} fits {args.workers} workers in max_connections={args.max_connections}"
+
+    return {
+        "pool_size" : pool_size,
+        "max_pool_size_for_budget" : budget,
+        "advice" : advice,
+    }
+
+async def seed(args) -> tuple:
+    from app.main import app
+
+    async with asgi_client(app) as client:
+        headers = await register_user(client)
+        topic_id = await create_topic(client, headers)
+        seed_flashcards(topic_id, args.cards)
+
+    await dispose_engines()
+    return headers, topic_id
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight per worker")
+    parser.add_argument("--requests", type=int, default=400, help="requests per worker")
+    parser.add_argument("--pool-sizes", default="2,4,8,16")
+    parser.add_argument("--max-overflow", type=int, default=0)
+    parser.add_argument("--sync-pool-size", type=int, default=2)
+    parser.add_argument("--pool-timeout", type=float, default=5.0)
+    parser.add_argument("--cards", type=int, default=200)
+    parser.add_argument("--db-latency-ms", type=float, default=5.0)
+    parser.add_argument("--max-connections", type=int, default=100)
+    parser.add_argument("--reserved", type=int, default=10)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    configure_database(args.database_url)
+    os.environ["DB_SYNC_POOL_SIZE"] = str(args.sync_pool_size)
+    headers, topic_id = asyncio.run(seed(args))
+
+    runs = [run_size(args, int(size), headers, topic_id) for size in args.pool_sizes.split(",")]
+    print(json.dumps({
+        "workers" : args.workers,
+        "concurrency_per_worker" : args.concurrency,
+        "db_latency_ms" : args.db_latency_ms,
+        "runs" : runs,
+        "recommendation" : recommend(args, runs),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
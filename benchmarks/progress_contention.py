@@ -0,0 +1,97 @@
+"""Concurrent session summaries for one user and topic.
+
+Finishes --sessions study sessions of --cards-per-session answers each, then
+requests all their summaries at once so the progress updates race. Exits
+non-zero when the counters do not add up or more than one user_progress row
+exists for the topic:
+
+    python -m benchmarks.progress_contention --sessions 50
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from .common import configure_database, asgi_client, register_user, create_topic, seed_flashcards, dispose_engines
+
+async def finish_answers(client, headers, topic_id: int, cards: int) -> str:
+    response = await client.post(f"/study/topics/{topic_id}/start", headers=headers)
+    response.raise_for_status()
+    session = response.json()
+
+    flashcard = session["flashcard"]
+    for i in range(cards):
+        response = await client.post("/study/answer", headers=headers, json={
+            "session_id" : session["session_id"],
+            "flashcard_id" : flashcard["id"],
+            "is_correct" : i % 2 == 0
+        })
+        response.raise_for_status()
+        if response.json()["has_next"]:
+            response = await client.get(f"/study/next/{session['session_id']}", headers=headers)
+            response.raise_for_status()
+            flashcard = response.json()["flashcard"]
+    return session["session_id"]
+
+async def run(args) -> dict:
+    from sqlalchemy import func, select
+    from app.database import SessionLocal
+    from app.main import app
+    from app.models import UserProgress
+
+    async with asgi_client(app) as client:
+        headers = await register_user(client)
+        topic_id = await create_topic(client, headers)
+        seed_flashcards(topic_id, args.cards_per_session)
+
+        session_ids = [
+            await finish_answers(client, headers, topic_id, args.cards_per_session)
+            for _ in range(args.sessions)
+        ]
+
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.get(f"/study/summary/{session_id}", headers=headers) for session_id in session_ids
+        ))
+        elapsed = time.perf_counter() - start
+        failed = [response.status_code for response in responses if response.status_code != 200]
+
+        topic_progress = (await client.get(f"/progress/topics/{topic_id}", headers=headers)).json()
+        overall = (await client.get("/progress", params={"include_topics" : False}, headers=headers)).json()
+
+    with SessionLocal() as db:
+        progress_rows = db.scalar(select(func.count(UserProgress.id)).where(UserProgress.topic_id == topic_id))
+
+    await dispose_engines()
+
+    return {
+        "sessions" : args.sessions,
+        "failed_summaries" : len(failed),
+        "summaries_seconds" : round(elapsed, 3),
+        "expected_reviewed" : (args.sessions - len(failed)) * args.cards_per_session,
+        "topic_reviewed" : topic_progress["flashcards_reviewed"],
+        "overall_reviewed" : overall["total_flashcards_reviewed"],
+        "progress_rows" : progress_rows,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--cards-per-session", type=int, default=3)
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    configure_database(args.database_url)
+    result = asyncio.run(run(args))
+    print(json.dumps(result, indent=2))
+
+    if result["failed_summaries"]:
+        sys.exit(f"{result['failed_summaries']} summaries failed")
+    if result["topic_reviewed"] != result["expected_reviewed"] or result["overall_reviewed"] != result["expected_reviewed"]:
+        sys.exit("Progress counters lost updates")
+    if result["progress_rows"] != 1:
+        sys.exit(f"Found {result['progress_rows']} progress rows for one user and topic")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Read-replica routing and read-your-writes with two SQLite files.
+
+The primary and the "replica" are separate SQLite databases; replication is
+simulated by copying the primary over the replica with SQLite's backup API,
+so the replica lags until --replicate is called. The script checks that
+read-only handlers go to the replica, that a user's reads go to the primary
+for READ_YOUR_WRITES_SECONDS after their own write, and that they return to
+the (now stale) replica afterwards. Exits non-zero when a check fails:
+
+    python -m benchmarks.read_replica --window-seconds 0.5
+
+Point --database-url and --replica-url at a Postgres primary and streaming
+replica to run the same checks against real replication; the copy step is
+skipped then, so only the routing counters are checked there.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+
+from .common import configure_database, asgi_client, register_user, create_topic, seed_flashcards, dispose_engines
+
+def sqlite_path(url: str) -> str:
+    return url.partition(":///")[2] if url.startswith("sqlite") else ""
+
+def replicate(primary_url: str, replica_url: str) -> None:
+    if not (sqlite_path(primary_url) and sqlite_path(replica_url)):
+        return
+    with sqlite3.connect(sqlite_path(primary_url)) as source, sqlite3.connect(sqlite_path(replica_url)) as target:
+        source.backup(target)
+
+def routed(target: str) -> float:
+    from app import database
+
+    return sum(database.reads_routed.value(target=target, reason=reason) for reason in ("read", "recent_write", "write"))
+
+async def run(args) -> dict:
+    from app.main import app
+
+    checks = {}
+    sync = replicate if sqlite_path(args.replica_url) else (lambda *urls: None)
+
+    async with asgi_client(app) as client:
+        headers = await register_user(client)
+        topic_id = await create_topic(client, headers)
+        seed_flashcards(topic_id, args.cards)
+        sync(args.database_url, args.replica_url)
+        await asyncio.sleep(args.window_seconds)
+
+        before = routed("replica")
+        for _ in range(args.reads):
+            (await client.get(f"/topics/{topic_id}/flashcards", headers=headers)).raise_for_status()
+        checks["reads_use_replica"] = routed("replica") - before >= args.reads
+
+        response = await client.post(f"/topics/{topic_id}/flashcards", headers=headers, json={
+            "question" : "Written after the last replication?",
+            "answer" : "Yes"
+        })
+        response.raise_for_status()
+        new_id = response.json()["id"]
+
+        before = routed("primary")
+        listed = (await client.get(f"/topics/{topic_id}/flashcards", headers=headers)).json()
+        checks["own_write_visible"] = any(card["id"] == new_id for card in listed)
+        checks["own_write_read_from_primary"] = routed("primary") > before
+
+        await asyncio.sleep(args.window_seconds)
+        if sqlite_path(args.replica_url):
+            listed = (await client.get(f"/topics/{topic_id}/flashcards", headers=headers)).json()
+            checks["replica_again_after_window"] = not any(card["id"] == new_id for card in listed)
+
+            sync(args.database_url, args.replica_url)
+            listed = (await client.get(f"/topics/{topic_id}/flashcards", headers=headers)).json()
+            checks["replica_caught_up"] = any(card["id"] == new_id for card in listed)
+
+    await dispose_engines()
+    from app import database
+    await database.replica_engine.dispose()
+
+    return {
+        "window_seconds" : args.window_seconds,
+        "routed_to_replica" : routed("replica"),
+        "routed_to_primary" : routed("primary"),
+        "checks" : checks,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reads", type=int, default=20)
+    parser.add_argument("--cards", type=int, default=20)
+    parser.add_argument("--window-seconds", type=float, default=0.5)
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    parser.add_argument("--replica-url", help="defaults to a second temporary SQLite file")
+    args = parser.parse_args()
+
+    args.database_url = configure_database(args.database_url)
+    if args.replica_url is None:
+        fd, path = tempfile.mkstemp(prefix="flashcards-replica-", suffix=".db")
+        os.close(fd)
+        args.replica_url = f"sqlite:///{path}"
+    os.environ["READ_REPLICA_URL"] = args.replica_url
+    os.environ["READ_YOUR_WRITES_SECONDS"] = str(args.window_seconds)
+
+    result = asyncio.run(run(args))
+    print(json.dumps(result, indent=2))
+    if not all(result["checks"].values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
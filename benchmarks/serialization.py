@@ -0,0 +1,98 @@
+"""Serialization throughput of large flashcard lists.
+
+Times three ways of turning N loaded Flashcard rows into a JSON body:
+
+* ``validate_json``: what FastAPI does for ``response_model=List[FlashcardResponse]``
+  with its stock JSONResponse (validate from attributes, dump to Python, json.dumps);
+* ``validate_orjson``: the same validation, rendered by the app-wide ORJSONResponse;
+* ``direct_orjson``: ``read_flashcard`` plus orjson.dumps, as the list handler does.
+
+All three bodies are checked to decode to the same document, then each is run
+--iterations times per size:
+
+    python -m benchmarks.serialization --sizes 100,1000,10000
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from .common import configure_database
+
+def build_flashcards(count: int) -> list:
+    from app.models import Flashcard
+
+    created = datetime(2026, 1, 1, 12, 0, 0, 123456)
+    return [
+        Flashcard(
+            id=i,
+            topic_id=1,
+            question=f"What does benchmark question number {i} ask about?",
+            answer=f"Answer {i}",
+            difficulty="medium",
+            created_at=created + timedelta(seconds=i)
+        )
+        for i in range(1, count + 1)
+    ]
+
+def serializers() -> dict:
+    from typing import List
+    import orjson
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from pydantic import TypeAdapter
+    from app.schemas import FlashcardResponse, read_flashcard
+
+    adapter = TypeAdapter(List[FlashcardResponse])
+
+    def validated(flashcards):
+        return adapter.dump_python(adapter.validate_python(flashcards, from_attributes=True), mode="json")
+
+    return {
+        "validate_json" : lambda flashcards: JSONResponse(validated(flashcards)).body,
+        "validate_orjson" : lambda flashcards: ORJSONResponse(validated(flashcards)).body,
+        "direct_orjson" : lambda flashcards: orjson.dumps([read_flashcard(flashcard) for flashcard in flashcards]),
+    }
+
+def measure(serialize, flashcards: list, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        serialize(flashcards)
+    return (time.perf_counter() - start) / iterations
+
+def run(args) -> dict:
+    candidates = serializers()
+    results = []
+    for size in args.sizes:
+        flashcards = build_flashcards(size)
+        bodies = {name : serialize(flashcards) for name, serialize in candidates.items()}
+        documents = [json.loads(body) for body in bodies.values()]
+        if any(document != documents[0] for document in documents):
+            raise SystemExit(f"serializers disagree for {size} flashcards")
+
+        timings = {name : measure(serialize, flashcards, args.iterations) for name, serialize in candidates.items()}
+        baseline = timings["validate_json"]
+        results.append({
+            "flashcards" : size,
+            "body_bytes" : len(bodies["direct_orjson"]),
+            **{
+                name : {
+                    "ms_per_response" : round(seconds * 1000, 3),
+                    "cards_per_second" : round(size / seconds),
+                    "speedup" : round(baseline / seconds, 2),
+                }
+                for name, seconds in timings.items()
+            },
+        })
+    return {"iterations" : args.iterations, "results" : results}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=lambda value: [int(size) for size in value.split(",")], default=[100, 1000, 10000])
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    configure_database()
+    print(json.dumps(run(args), indent=2))
+
+if __name__ == "__main__":
+    main()
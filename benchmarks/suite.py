@@ -0,0 +1,424 @@
+"""Reproducible load test of the whole API.
+
+Seeds --users users with --topics-per-user topics of --cards-per-topic cards
+through the API itself, then runs one phase per endpoint with --concurrency
+requests in flight: auth, topics, flashcards (reads, conditional reads and
+writes), search, progress, the study flow and AI generation. Each endpoint
+reports throughput, p50/p95/p99 latency, errors and, in-process, the number
+of SQL statements per request. The run is printed and optionally saved as
+JSON, so two releases can be diffed:
+
+    python -m benchmarks.suite --output before.json
+    git checkout <other revision>
+    python -m benchmarks.suite --output after.json --baseline before.json
+
+By default the app runs in-process behind httpx's ASGI transport, with its
+lifespan (job workers, review log) started, on a temporary SQLite file or
+--database-url, and the OpenAI client pointed at benchmarks.openai_stub.
+With --base-url the same phases go over HTTP to a running server instead;
+start that server with OPENAI_BASE_URL pointing at the stub, and note that
+statement counts are only available in-process. --seed fixes every random
+choice, so runs with the same arguments issue the same requests.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+from .common import configure_database, summarize, asgi_client, dispose_engines
+
+WORDS = (
+    "photosynthesis", "mitochondria", "enzyme", "protein", "genome", "osmosis", "neuron", "hormone",
+    "gravity", "momentum", "entropy", "voltage", "photon", "isotope", "catalyst", "equilibrium",
+    "renaissance", "empire", "revolution", "treaty", "monarchy", "republic", "feudalism", "crusade",
+    "derivative", "integral", "matrix", "vector", "theorem", "polynomial", "logarithm", "probability",
+)
+PASSWORD = "benchmark-password"
+
+_request_queries = contextvars.ContextVar("request_queries", default=None)
+
+def install_query_counter() -> None:
+    """Count statements per request; the ASGI transport runs the app in the caller's task and context."""
+    from sqlalchemy import event
+    from app import database
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        holder = _request_queries.get()
+        if holder is not None:
+            holder[0] += 1
+
+    engines = [database.engine, database.async_engine.sync_engine]
+    if getattr(database, "replica_engine", None) is not None:
+        engines.append(database.replica_engine.sync_engine)
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", count)
+
+def install_ai_stub() -> None:
+    import httpx
+    import openai
+    from app import generation
+    from . import openai_stub
+
+    generation._client = openai.AsyncOpenAI(
+        api_key="stub",
+        base_url="http://openai-stub/v1",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=openai_stub.app), base_url="http://openai-stub/v1")
+    )
+
+class Recorder:
+    def __init__(self, count_queries: bool):
+        self.count_queries = count_queries
+        self.latencies = {}
+        self.queries = {}
+        self.errors = {}
+        self.elapsed = {}
+
+    async def call(self, client, name: str, method: str, url: str, expect=(200,), **kwargs):
+        holder = [0]
+        token = _request_queries.set(holder)
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except Exception:
+            response = None
+        finally:
+            _request_queries.reset(token)
+
+        self.record(name, time.perf_counter() - start, holder[0])
+        if response is None or response.status_code not in expect:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            return None
+        return response
+
+    def record(self, name: str, seconds: float, queries: int=0) -> None:
+        self.latencies.setdefault(name, []).append(seconds)
+        self.queries.setdefault(name, []).append(queries)
+
+    def report(self) -> dict:
+        endpoints = {}
+        for name, latencies in self.latencies.items():
+            queries = self.queries[name]
+            endpoints[name] = {
+                "errors" : self.errors.get(name, 0),
+                **summarize(latencies, self.elapsed.get(name)),
+            }
+            if self.count_queries:
+                endpoints[name]["queries_mean"] = round(sum(queries) / len(queries), 2)
+                endpoints[name]["queries_max"] = max(queries)
+        return endpoints
+
+async def run_phase(recorder: Recorder, names, concurrency: int, tasks) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(task):
+        async with semaphore:
+            await task()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(bounded(task) for task in tasks))
+    elapsed = time.perf_counter() - start
+    for name in names:
+        recorder.elapsed[name] = elapsed
+
+def card_rows(rng: random.Random, prefix: str, count: int) -> str:
+    lines = ["question,answer"]
+    for i in range(count):
+        first, second, third = rng.sample(WORDS, 3)
+        lines.append(f"How does {first} relate to {second} ({prefix}.{i})?,{third}")
+    return "\n".join(lines) + "\n"
+
+async def seed(client, args, rng: random.Random) -> list:
+    run_id = uuid.uuid4().hex[:8]
+    users = []
+    for u in range(args.users):
+        username = f"suite-{run_id}-{u}"
+        response = await client.post("/auth/register", json={
+            "email" : f"{username}@example.com",
+            "username" : username,
+            "password" : PASSWORD
+        })
+        response.raise_for_status()
+        headers = {"Authorization" : f"Bearer {response.json()['access_token']}"}
+
+        topics = []
+        for t in range(args.topics_per_user):
+            response = await client.post("/topics", json={"name" : f"Topic {t}", "description" : rng.choice(WORDS)}, headers=headers)
+            response.raise_for_status()
+            topic_id = response.json()["id"]
+
+            response = await client.post(
+                f"/topics/{topic_id}/flashcards/import?format=csv&skip_duplicates=false",
+                files={"file" : ("cards.csv", card_rows(rng, f"{u}.{t}", args.cards_per_topic), "text/csv")},
+                headers=headers
+            )
+            response.raise_for_status()
+
+            response = await client.get(f"/topics/{topic_id}/flashcards?limit=100", headers=headers)
+            response.raise_for_status()
+            topics.append({"id" : topic_id, "cards" : [card["id"] for card in response.json()]})
+
+        users.append({"username" : username, "headers" : headers, "topics" : topics})
+    return users
+
+def request_phases(args, rng: random.Random, users: list) -> list:
+    """(name, request count, factory) triples; a factory returns (method, url, kwargs, expected statuses)."""
+
+    def user():
+        return rng.choice(users)
+
+    def topic_of(chosen):
+        return rng.choice(chosen["topics"])
+
+    def login():
+        chosen = user()
+        return "POST", "/auth/login", {"json" : {"username" : chosen["username"], "password" : PASSWORD}}, (201,)
+
+    def me():
+        return "GET", "/auth/me", {"headers" : user()["headers"]}, (200,)
+
+    def topics_list():
+        return "GET", "/topics", {"headers" : user()["headers"]}, (200,)
+
+    def topics_list_conditional():
+        chosen = user()
+        headers = {**chosen["headers"], "If-None-Match" : chosen.get("topics_etag", "")}
+        return "GET", "/topics", {"headers" : headers}, (304,)
+
+    def topic_get():
+        chosen = user()
+        return "GET", f"/topics/{topic_of(chosen)['id']}", {"headers" : chosen["headers"]}, (200,)
+
+    def flashcards_list():
+        chosen = user()
+        return "GET", f"/topics/{topic_of(chosen)['id']}/flashcards?limit=100", {"headers" : chosen["headers"]}, (200,)
+
+    def flashcard_get():
+        chosen = user()
+        topic = topic_of(chosen)
+        return "GET", f"/topics/{topic['id']}/flashcards/{rng.choice(topic['cards'])}", {"headers" : chosen["headers"]}, (200,)
+
+    def search():
+        chosen = user()
+        return "GET", f"/flashcards/search?q={rng.choice(WORDS)}", {"headers" : chosen["headers"]}, (200, 501)
+
+    def progress():
+        return "GET", "/progress", {"headers" : user()["headers"]}, (200,)
+
+    def flashcard_create():
+        chosen = user()
+        first, second = rng.sample(WORDS, 2)
+        body = {"question" : f"Why is {first} unlike {second} ({uuid.uuid4().hex[:8]})?", "answer" : rng.choice(WORDS)}
+        return "POST", f"/topics/{topic_of(chosen)['id']}/flashcards", {"json" : body, "headers" : chosen["headers"]}, (201,)
+
+    def flashcard_update():
+        chosen = user()
+        topic = topic_of(chosen)
+        url = f"/topics/{topic['id']}/flashcards/{rng.choice(topic['cards'])}"
+        return "PATCH", url, {"json" : {"answer" : rng.choice(WORDS)}, "headers" : chosen["headers"]}, (200,)
+
+    requests = args.requests
+    return [
+        ("auth.login", max(1, requests // 10), login),
+        ("auth.me", requests, me),
+        ("topics.list", requests, topics_list),
+        ("topics.list.not_modified", requests, topics_list_conditional),
+        ("topics.get", requests, topic_get),
+        ("flashcards.list", requests, flashcards_list),
+        ("flashcards.get", requests, flashcard_get),
+        ("search", requests, search),
+        ("progress", requests, progress),
+        ("flashcards.create", requests, flashcard_create),
+        ("flashcards.update", requests, flashcard_update),
+    ]
+
+async def study_session(recorder: Recorder, client, rng: random.Random, chosen: dict, answers: int) -> None:
+    headers = chosen["headers"]
+    topic_id = rng.choice(chosen["topics"])["id"]
+    response = await recorder.call(
+        client, "study.start", "POST", f"/study/topics/{topic_id}/start?mode=due&limit={answers}", expect=(201,), headers=headers
+    )
+    if response is None:
+        return
+
+    session = response.json()
+    session_id = session["session_id"]
+    flashcard = session["flashcard"]
+    while flashcard is not None:
+        response = await recorder.call(client, "study.answer", "POST", "/study/answer", expect=(201,), headers=headers, json={
+            "session_id" : session_id,
+            "flashcard_id" : flashcard["id"],
+            "is_correct" : rng.random() < 0.7,
+            "latency_ms" : rng.randint(500, 8000)
+        })
+        if response is None or not response.json()["has_next"]:
+            break
+
+        response = await recorder.call(client, "study.next", "GET", f"/study/next/{session_id}", headers=headers)
+        flashcard = response.json()["flashcard"] if response is not None else None
+
+    await recorder.call(client, "study.summary", "GET", f"/study/summary/{session_id}", headers=headers)
+
+async def generation_job(recorder: Recorder, client, rng: random.Random, chosen: dict, count: int, timeout: float) -> None:
+    headers = chosen["headers"]
+    topic_id = rng.choice(chosen["topics"])["id"]
+    # A fresh topic name per job keeps the generation cache from answering instead of the (stubbed) model.
+    start = time.perf_counter()
+    response = await recorder.call(
+        client, "generation.enqueue", "POST", f"/topics/{topic_id}/flashcards/generate", expect=(202,), headers=headers,
+        json={"topic_name" : f"{rng.choice(WORDS)} {uuid.uuid4().hex[:8]}", "count" : count}
+    )
+    if response is None:
+        return
+
+    job_id = response.json()["id"]
+    while time.perf_counter() - start < timeout:
+        response = await recorder.call(client, "jobs.get", "GET", f"/jobs/{job_id}", headers=headers)
+        status = response.json()["status"] if response is not None else "failed"
+        if status not in ("queued", "running"):
+            if status == "succeeded":
+                recorder.record("generation.job", time.perf_counter() - start)
+            else:
+                recorder.errors["generation.job"] = recorder.errors.get("generation.job", 0) + 1
+            return
+        await asyncio.sleep(0.05)
+
+    recorder.errors["generation.job"] = recorder.errors.get("generation.job", 0) + 1
+
+async def drive(client, args, recorder: Recorder) -> dict:
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    users = await seed(client, args, rng)
+    seed_seconds = time.perf_counter() - started
+
+    for chosen in users:
+        chosen["topics_etag"] = (await client.get("/topics", headers=chosen["headers"])).headers.get("etag", "")
+
+    for name, count, factory in request_phases(args, rng, users):
+        requests = [factory() for _ in range(count)]
+        tasks = [
+            lambda name=name, method=method, url=url, kwargs=kwargs, expect=expect: recorder.call(client, name, method, url, expect, **kwargs)
+            for method, url, kwargs, expect in requests
+        ]
+        await run_phase(recorder, [name], args.concurrency, tasks)
+
+    sessions = [rng.choice(users) for _ in range(args.study_sessions)]
+    await run_phase(recorder, ["study.start", "study.answer", "study.next", "study.summary"], args.concurrency, [
+        lambda chosen=chosen, session_rng=random.Random(rng.random()): study_session(recorder, client, session_rng, chosen, args.study_answers)
+        for chosen in sessions
+    ])
+
+    if args.generation_jobs:
+        jobs = [rng.choice(users) for _ in range(args.generation_jobs)]
+        await run_phase(recorder, ["generation.enqueue", "generation.job", "jobs.get"], args.concurrency, [
+            lambda chosen=chosen, job_rng=random.Random(rng.random()): generation_job(recorder, client, job_rng, chosen, args.generation_count, args.job_timeout)
+            for chosen in jobs
+        ])
+
+    return {"seed_seconds" : round(seed_seconds, 2)}
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+async def run(args) -> dict:
+    if args.base_url:
+        import httpx
+
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=60, limits=limits) as client:
+            recorder = Recorder(count_queries=False)
+            extra = await drive(client, args, recorder)
+        database = None
+    else:
+        from app import database as app_database
+        from app.main import app
+
+        install_query_counter()
+        install_ai_stub()
+        recorder = Recorder(count_queries=True)
+        async with app.router.lifespan_context(app), asgi_client(app) as client:
+            extra = await drive(client, args, recorder)
+        database = app_database.async_engine.dialect.name
+        await dispose_engines()
+
+    return {
+        "meta" : {
+            "revision" : git_revision(),
+            "timestamp" : datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python" : platform.python_version(),
+            "target" : args.base_url or "in-process",
+            "database" : database,
+            "arguments" : {key : value for key, value in vars(args).items() if key not in ("output", "baseline", "database_url")},
+            **extra,
+        },
+        "endpoints" : recorder.report(),
+    }
+
+def compare(baseline: dict, current: dict, max_regression: float=None) -> bool:
+    """Print per-endpoint changes to stderr; False when a p95 regressed by more than ``max_regression`` percent."""
+    ok = True
+    print(f"{'endpoint':<28}{'p95 ms':>22}{'rps':>22}{'queries':>16}", file=sys.stderr)
+    for name, now in current["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if before is None:
+            continue
+
+        change = (now["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0.0
+        if max_regression is not None and change > max_regression:
+            ok = False
+        p95 = f"{before['p95_ms']:.1f} -> {now['p95_ms']:.1f} ({change:+.0f}%)"
+        rps = f"{before.get('throughput_rps', 0):.0f} -> {now.get('throughput_rps', 0):.0f}"
+        queries = f"{before.get('queries_mean', '-')} -> {now.get('queries_mean', '-')}"
+        print(f"{name:<28}{p95:>22}{rps:>22}{queries:>16}", file=sys.stderr)
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--topics-per-user", type=int, default=5)
+    parser.add_argument("--cards-per-topic", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint phase")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--study-sessions", type=int, default=40)
+    parser.add_argument("--study-answers", type=int, default=10, help="cards per study session")
+    parser.add_argument("--generation-jobs", type=int, default=10)
+    parser.add_argument("--generation-count", type=int, default=10, help="cards per generation job")
+    parser.add_argument("--job-timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    parser.add_argument("--base-url", help="drive a running server over HTTP instead of the in-process app")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, help="exit non-zero when any p95 grew by more than this many percent")
+    args = parser.parse_args()
+
+    if not args.base_url:
+        configure_database(args.database_url)
+        # The generate route refuses to enqueue without a key; the stub accepts any.
+        os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if not compare(baseline, results, args.max_regression):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
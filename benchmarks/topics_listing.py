@@ -0,0 +1,71 @@
+"""Query count and latency of GET /topics for a user with large decks.
+
+Seeds one user with --topics topics of --cards-per-topic cards each, then
+times repeated GET /topics calls. Exits non-zero when a request issues more
+than --max-queries statements or p95 latency exceeds --max-p95-ms, so it
+can guard against the per-topic lazy loading coming back.
+
+    python -m benchmarks.topics_listing --topics 200 --cards-per-topic 250
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from .common import (
+    configure_database, summarize, asgi_client, register_user, create_topic, seed_flashcards, dispose_engines, QueryCounter
+)
+
+async def run(args) -> dict:
+    from app.main import app
+
+    async with asgi_client(app) as client:
+        headers = await register_user(client)
+        for i in range(args.topics):
+            topic_id = await create_topic(client, headers, name=f"Topic {i}")
+            seed_flashcards(topic_id, args.cards_per_topic)
+
+        # Warm the token and user caches so only the listing itself is measured.
+        (await client.get("/topics", headers=headers)).raise_for_status()
+
+        latencies = []
+        queries = []
+        for _ in range(args.iterations):
+            with QueryCounter() as counter:
+                start = time.perf_counter()
+                response = await client.get("/topics", headers=headers)
+                latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+            queries.append(counter.count)
+
+    await dispose_engines()
+
+    return {
+        "topics" : args.topics,
+        "cards_per_topic" : args.cards_per_topic,
+        "max_queries_per_request" : max(queries),
+        **summarize(latencies),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--cards-per-topic", type=int, default=250)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--max-queries", type=int, default=2)
+    parser.add_argument("--max-p95-ms", type=float, default=250.0)
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    configure_database(args.database_url)
+    result = asyncio.run(run(args))
+    print(json.dumps(result, indent=2))
+
+    if result["max_queries_per_request"] > args.max_queries:
+        sys.exit(f"GET /topics issued {result['max_queries_per_request']} queries (limit {args.max_queries})")
+    if result["p95_ms"] > args.max_p95_ms:
+        sys.exit(f"GET /topics p95 {result['p95_ms']} ms exceeds {args.max_p95_ms} ms")
+
+if __name__ == "__main__":
+    main()
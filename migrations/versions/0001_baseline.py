@@ -0,0 +1,70 @@
+"""Baseline: the schema created by the original create_all
+
+Existing deployments already have these tables; mark them with
+`alembic stamp 0001` before running `alembic upgrade head`.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), nullable=False)
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    op.create_table(
+        "topics",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), nullable=False)
+    )
+    op.create_index("ix_topics_id", "topics", ["id"])
+    op.create_index("ix_topics_name", "topics", ["name"])
+
+    op.create_table(
+        "flashcards",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("topic_id", sa.Integer(), sa.ForeignKey("topics.id"), nullable=False),
+        sa.Column("question", sa.Text(), nullable=False),
+        sa.Column("answer", sa.Text(), nullable=False),
+        sa.Column("difficulty", sa.String()),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), nullable=False)
+    )
+    op.create_index("ix_flashcards_id", "flashcards", ["id"])
+
+    op.create_table(
+        "user_progress",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("topic_id", sa.Integer(), sa.ForeignKey("topics.id"), nullable=False),
+        sa.Column("flashcards_reviewed", sa.Integer()),
+        sa.Column("correct_answers", sa.Integer()),
+        sa.Column("total_answers", sa.Integer()),
+        sa.Column("last_study_date", sa.DateTime()),
+        sa.Column("streak_days", sa.Integer())
+    )
+    op.create_index("ix_user_progress_id", "user_progress", ["id"])
+
+def downgrade() -> None:
+    op.drop_table("user_progress")
+    op.drop_table("flashcards")
+    op.drop_table("topics")
+    op.drop_table("users")
@@ -0,0 +1,197 @@
+"""Spaced repetition, shared sessions, generation jobs, search, dedup and progress rollups
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+POSTGRES_SEARCH_DDL = [
+    """
+    ALTER TABLE flashcards ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(question, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(answer, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_flashcards_search_vector ON flashcards USING GIN (search_vector)",
+]
+
+SQLITE_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS flashcards_fts USING fts5(
+        question, answer, content='flashcards', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS flashcards_fts_insert AFTER INSERT ON flashcards BEGIN
+        INSERT INTO flashcards_fts(rowid, question, answer) VALUES (new.id, new.question, new.answer);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS flashcards_fts_delete AFTER DELETE ON flashcards BEGIN
+        INSERT INTO flashcards_fts(flashcards_fts, rowid, question, answer) VALUES ('delete', old.id, old.question, old.answer);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS flashcards_fts_update AFTER UPDATE OF question, answer ON flashcards BEGIN
+        INSERT INTO flashcards_fts(flashcards_fts, rowid, question, answer) VALUES ('delete', old.id, old.question, old.answer);
+        INSERT INTO flashcards_fts(rowid, question, answer) VALUES (new.id, new.question, new.answer);
+    END
+    """,
+    "INSERT INTO flashcards_fts(flashcards_fts) VALUES ('rebuild')",
+]
+
+# Keep one progress row per (user, topic): fold duplicates into the oldest row before adding the constraint.
+MERGE_DUPLICATE_PROGRESS = [
+    """
+    UPDATE user_progress SET
+        flashcards_reviewed = (SELECT SUM(p.flashcards_reviewed) FROM user_progress p
+                               WHERE p.user_id = user_progress.user_id AND p.topic_id = user_progress.topic_id),
+        correct_answers = (SELECT SUM(p.correct_answers) FROM user_progress p
+                           WHERE p.user_id = user_progress.user_id AND p.topic_id = user_progress.topic_id),
+        total_answers = (SELECT SUM(p.total_answers) FROM user_progress p
+                         WHERE p.user_id = user_progress.user_id AND p.topic_id = user_progress.topic_id),
+        streak_days = (SELECT MAX(p.streak_days) FROM user_progress p
+                       WHERE p.user_id = user_progress.user_id AND p.topic_id = user_progress.topic_id),
+        last_study_date = (SELECT MAX(p.last_study_date) FROM user_progress p
+                           WHERE p.user_id = user_progress.user_id AND p.topic_id = user_progress.topic_id)
+    WHERE id IN (SELECT MIN(id) FROM user_progress GROUP BY user_id, topic_id HAVING COUNT(*) > 1)
+    """,
+    "DELETE FROM user_progress WHERE id NOT IN (SELECT MIN(id) FROM user_progress GROUP BY user_id, topic_id)",
+]
+
+def upgrade() -> None:
+    for statement in MERGE_DUPLICATE_PROGRESS:
+        op.execute(statement)
+    with op.batch_alter_table("user_progress") as batch:
+        batch.create_unique_constraint("uq_user_progress_user_topic", ["user_id", "topic_id"])
+
+    op.create_table(
+        "card_reviews",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("topic_id", sa.Integer(), sa.ForeignKey("topics.id"), nullable=False),
+        sa.Column("flashcard_id", sa.Integer(), sa.ForeignKey("flashcards.id"), nullable=False),
+        sa.Column("repetitions", sa.Integer(), nullable=False),
+        sa.Column("lapses", sa.Integer(), nullable=False),
+        sa.Column("interval_days", sa.Float(), nullable=False),
+        sa.Column("ease_factor", sa.Float(), nullable=False),
+        sa.Column("due_at", sa.DateTime(), nullable=False),
+        sa.Column("last_reviewed_at", sa.DateTime()),
+        sa.UniqueConstraint("user_id", "flashcard_id", name="uq_card_reviews_user_flashcard")
+    )
+    op.create_index("ix_card_reviews_id", "card_reviews", ["id"])
+    op.create_index("ix_card_reviews_user_topic_due", "card_reviews", ["user_id", "topic_id", "due_at"])
+
+    op.create_table(
+        "study_sessions",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("data", sa.Text(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False)
+    )
+    op.create_index("ix_study_sessions_user_id", "study_sessions", ["user_id"])
+    op.create_index("ix_study_sessions_expires_at", "study_sessions", ["expires_at"])
+
+    op.create_table(
+        "generation_jobs",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("topic_id", sa.Integer(), sa.ForeignKey("topics.id"), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("request", sa.JSON(), nullable=False),
+        sa.Column("flashcard_ids", sa.JSON()),
+        sa.Column("error", sa.Text()),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("locked_by", sa.String()),
+        sa.Column("locked_at", sa.DateTime()),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column("updated_at", sa.DateTime())
+    )
+    op.create_index("ix_generation_jobs_user_id", "generation_jobs", ["user_id"])
+    op.create_index("ix_generation_jobs_status_created", "generation_jobs", ["status", "created_at"])
+
+    op.create_table(
+        "generation_cache",
+        sa.Column("key", sa.String(64), primary_key=True),
+        sa.Column("model", sa.String(), nullable=False),
+        sa.Column("cards", sa.JSON(), nullable=False),
+        sa.Column("hits", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column("last_used_at", sa.DateTime(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False)
+    )
+    op.create_index("ix_generation_cache_last_used_at", "generation_cache", ["last_used_at"])
+    op.create_index("ix_generation_cache_expires_at", "generation_cache", ["expires_at"])
+
+    op.create_table(
+        "flashcard_signature_buckets",
+        sa.Column("flashcard_id", sa.Integer(), sa.ForeignKey("flashcards.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("band", sa.Integer(), primary_key=True),
+        sa.Column("topic_id", sa.Integer(), sa.ForeignKey("topics.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("bucket", sa.BigInteger(), nullable=False)
+    )
+    op.create_index("ix_flashcard_signature_buckets_topic_bucket", "flashcard_signature_buckets", ["topic_id", "bucket"])
+
+    op.create_table(
+        "user_progress_summaries",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("topics_studied", sa.Integer(), nullable=False),
+        sa.Column("flashcards_reviewed", sa.Integer(), nullable=False),
+        sa.Column("correct_answers", sa.Integer(), nullable=False),
+        sa.Column("total_answers", sa.Integer(), nullable=False),
+        sa.Column("current_streak", sa.Integer(), nullable=False),
+        sa.Column("longest_streak", sa.Integer(), nullable=False),
+        sa.Column("last_study_date", sa.DateTime())
+    )
+
+    op.create_table(
+        "review_events",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("created_at", sa.DateTime(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("topic_id", sa.Integer(), nullable=False),
+        sa.Column("flashcard_id", sa.Integer(), nullable=False),
+        sa.Column("session_id", sa.String(36), nullable=False),
+        sa.Column("is_correct", sa.Boolean(), nullable=False),
+        sa.Column("quality", sa.Integer()),
+        sa.Column("latency_ms", sa.Integer())
+    )
+    op.create_index("ix_review_events_user_created", "review_events", ["user_id", "created_at"])
+    op.create_index("ix_review_events_flashcard_created", "review_events", ["flashcard_id", "created_at"])
+
+    dialect = op.get_context().dialect.name
+    if dialect == "postgresql":
+        for statement in POSTGRES_SEARCH_DDL:
+            op.execute(statement)
+    elif dialect == "sqlite":
+        for statement in SQLITE_SEARCH_DDL:
+            op.execute(statement)
+
+def downgrade() -> None:
+    dialect = op.get_context().dialect.name
+    if dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_flashcards_search_vector")
+        op.execute("ALTER TABLE flashcards DROP COLUMN IF EXISTS search_vector")
+    elif dialect == "sqlite":
+        for trigger in ("flashcards_fts_insert", "flashcards_fts_delete", "flashcards_fts_update"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS flashcards_fts")
+
+    op.drop_table("review_events")
+    op.drop_table("user_progress_summaries")
+    op.drop_table("flashcard_signature_buckets")
+    op.drop_table("generation_cache")
+    op.drop_table("generation_jobs")
+    op.drop_table("study_sessions")
+    op.drop_table("card_reviews")
+
+    with op.batch_alter_table("user_progress") as batch:
+        batch.drop_constraint("uq_user_progress_user_topic", type_="unique")
@@ -0,0 +1,33 @@
+"""Indexes for topic ownership, card listing, progress and cascade lookups
+
+Built CONCURRENTLY on PostgreSQL so existing deployments keep serving writes
+while the indexes are created.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_topics_user_id", "topics", ["user_id"]),
+    ("ix_flashcards_topic_id_id", "flashcards", ["topic_id", "id"]),
+    ("ix_user_progress_topic_id", "user_progress", ["topic_id"]),
+    ("ix_card_reviews_flashcard_id", "card_reviews", ["flashcard_id"]),
+    ("ix_generation_jobs_topic_id", "generation_jobs", ["topic_id"]),
+]
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
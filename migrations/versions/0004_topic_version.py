@@ -0,0 +1,20 @@
+"""Per-topic version counter for ETags on topic and flashcard listings
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column("topics", sa.Column("version", sa.Integer(), server_default="1", nullable=False))
+
+def downgrade() -> None:
+    with op.batch_alter_table("topics") as batch:
+        batch.drop_column("version")
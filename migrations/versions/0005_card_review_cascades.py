@@ -0,0 +1,28 @@
+"""Cascade card_reviews deletes from their flashcard and topic
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+# Names the unnamed SQLite constraints so batch mode can drop them; matches PostgreSQL's default names.
+NAMING_CONVENTION = {"fk" : "%(table_name)s_%(column_0_name)s_fkey"}
+
+def _replace_foreign_keys(ondelete) -> None:
+    with op.batch_alter_table("card_reviews", naming_convention=NAMING_CONVENTION) as batch:
+        batch.drop_constraint("card_reviews_topic_id_fkey", type_="foreignkey")
+        batch.drop_constraint("card_reviews_flashcard_id_fkey", type_="foreignkey")
+        batch.create_foreign_key("card_reviews_topic_id_fkey", "topics", ["topic_id"], ["id"], ondelete=ondelete)
+        batch.create_foreign_key("card_reviews_flashcard_id_fkey", "flashcards", ["flashcard_id"], ["id"], ondelete=ondelete)
+
+def upgrade() -> None:
+    _replace_foreign_keys("CASCADE")
+
+def downgrade() -> None:
+    _replace_foreign_keys(None)
@@ -0,0 +1,29 @@
+"""Compute duplicate-detection signatures for flashcards created before they existed.
+
+Uses DATABASE_URL like the application. Safe to re-run; only cards without
+signature buckets are indexed. Run from the repository root:
+
+    python -m scripts.backfill_signatures --batch-size 1000
+"""
+import argparse
+import asyncio
+
+async def run(batch_size: int) -> int:
+    from app.database import AsyncSessionLocal, async_engine
+    from app.dedup import backfill
+
+    try:
+        async with AsyncSessionLocal() as db:
+            return await backfill(db, batch_size)
+    finally:
+        await async_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"Indexed {asyncio.run(run(args.batch_size))} flashcards")
+
+if __name__ == "__main__":
+    main()